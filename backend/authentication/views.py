@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.urls import reverse
@@ -14,6 +15,19 @@ from .serializers import (
     UserSerializer
 )
 from .models import UserProfile
+from cart.guest import merge_guest_cart, request_cart_token
+import logging
+
+logger = logging.getLogger(__name__)
+
+def merge_request_cart(request, user):
+    """Move the guest cart sent with ``request`` into ``user``'s cart"""
+    try:
+        with transaction.atomic():
+            merge_guest_cart(user, request_cart_token(request))
+    except Exception as e:
+        # Never fail a login over the cart
+        logger.error(f"Error merging guest cart for user {user.id}: {str(e)}")
 
 class RegisterView(generics.CreateAPIView):
     """
@@ -34,6 +48,8 @@ class RegisterView(generics.CreateAPIView):
         user.profile.email_verified = True
         user.profile.save()
         
+        merge_request_cart(request, user)
+        
         return Response({
             "token": token.key,
             "user": {
@@ -76,6 +92,8 @@ class LoginView(APIView):
         
         token, created = Token.objects.get_or_create(user=authenticated_user)
         
+        merge_request_cart(request, authenticated_user)
+        
         return Response({
             "token": token.key,
             "user": {
@@ -0,0 +1,149 @@
+"""
+Opt-in keyset (cursor) pagination.
+
+Page-number pagination needs a COUNT(*) plus an OFFSET scan for every page.
+Clients that send ``?pagination=cursor`` (or follow a ``cursor`` link) get
+keyset pages instead: rows are located with ``(field, id) > (value, id)``
+so every page costs one indexed range query and no count.
+"""
+import base64
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over a single ordering field with ``id`` as tie-breaker
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering_param = api_settings.ORDERING_PARAM
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, view):
+        """
+        Return ``(field, descending)`` from ``?ordering=`` when the view allows
+        it, otherwise from the view's default ordering, otherwise ``id``
+        """
+        allowed = set(getattr(view, 'ordering_fields', None) or [])
+        requested = request.query_params.get(self.ordering_param, '')
+        for term in (term.strip() for term in requested.split(',')):
+            if term and term.lstrip('-') in allowed:
+                return term.lstrip('-'), term.startswith('-')
+        default = getattr(view, 'ordering', None)
+        if default:
+            term = default if isinstance(default, str) else default[0]
+            return term.lstrip('-'), term.startswith('-')
+        return 'id', False
+
+    def encode_cursor(self, value, pk, reverse=False):
+        payload = {'v': None if value is None else str(value), 'id': pk}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request, model, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            model_field = model._meta.get_field(field)
+            value = payload['v']
+            return model_field.to_python(value), int(payload['id']), bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _value(obj, field):
+        return obj[field] if isinstance(obj, dict) else getattr(obj, field)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field, self.descending = self.get_ordering(request, view)
+        cursor = self.decode_cursor(request, queryset.model, self.field)
+        value, pk, self.reverse = cursor if cursor else (None, None, False)
+
+        # Walking backwards flips the direction, then the page is re-reversed
+        descending = self.descending != self.reverse
+        prefix = '-' if descending else ''
+        keys = [f'{prefix}{self.field}'] if self.field != 'id' else []
+        queryset = queryset.order_by(*keys, f'{prefix}id')
+
+        if cursor:
+            lookup = 'lt' if descending else 'gt'
+            if self.field == 'id':
+                queryset = queryset.filter(**{f'id__{lookup}': pk})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__{lookup}': value}) |
+                    Q(**{self.field: value, f'id__{lookup}': pk})
+                )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def _link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self._value(obj, self.field), self._value(obj, 'id'), reverse)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class OptionalKeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, keyset pagination when the client
+    asks for it with ``?pagination=cursor`` or sends a ``cursor``
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def keyset_requested(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_requested(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
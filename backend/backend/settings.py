@@ -114,6 +114,11 @@ if not os.environ.get('DATABASE_URL') and DEBUG:
         }
     }
 
+# Tests on SQLite use a file rather than the in-memory default, so tests that
+# run parallel writers (cart upserts) get real concurrent connections
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('TEST', {})['NAME'] = BASE_DIR / 'test_db.sqlite3'
+
 # Uncomment to use PostgreSQL
 # DATABASES = {
 #     'default': {
@@ -215,6 +220,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-cart-token',  # Guest cart token
 ]
 
 # Rest Framework Settings
@@ -235,6 +241,48 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 12,
 }
 
+# Cache used for catalog data (versions, facets, responses). Every worker must
+# see the same catalog version, so deployments set CACHE_BACKEND=database to
+# keep it in a table of the shared database (created by build.sh). The
+# in-process default only suits a single process (development, tests);
+# products.checks warns when production runs on it.
+if os.environ.get('CACHE_BACKEND') == 'database':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'aurelis-wear',
+        }
+    }
+
+# Catalog caching and facets
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60 * 60))
+PRODUCT_FACET_PRICE_BUCKETS = [500, 1000, 2500, 5000]
+CATALOG_RESPONSE_CACHE = os.environ.get('CATALOG_RESPONSE_CACHE', 'True') == 'True'
+# Serve simple product listings from the in-memory catalog snapshot
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'True') == 'True'
+# Maximum number of products returned by /api/products/featured/
+FEATURED_PRODUCTS_LIMIT = int(os.environ.get('FEATURED_PRODUCTS_LIMIT', 12))
+# Upper bound (seconds) on how long another worker can serve a stale featured payload
+FEATURED_CACHE_TIMEOUT = int(os.environ.get('FEATURED_CACHE_TIMEOUT', 5 * 60))
+# Maximum number of ids accepted by /api/products/bulk/
+PRODUCT_BULK_MAX_IDS = int(os.environ.get('PRODUCT_BULK_MAX_IDS', 50))
+# Maximum number of operations accepted by /api/cart/batch/
+CART_BATCH_MAX_OPERATIONS = int(os.environ.get('CART_BATCH_MAX_OPERATIONS', 100))
+# Guest carts: maximum number of lines and token lifetime (seconds)
+CART_GUEST_MAX_LINES = int(os.environ.get('CART_GUEST_MAX_LINES', 50))
+CART_GUEST_TOKEN_MAX_AGE = int(os.environ.get('CART_GUEST_TOKEN_MAX_AGE', 30 * 24 * 60 * 60))
+# Maximum number of hits returned by /api/products/suggest/
+PRODUCT_SUGGEST_LIMIT = int(os.environ.get('PRODUCT_SUGGEST_LIMIT', 8))
+# Cache-Control max-age (seconds) for colors, sizes and categories
+REFERENCE_DATA_MAX_AGE = int(os.environ.get('REFERENCE_DATA_MAX_AGE', 60 * 60))
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -0,0 +1,75 @@
+"""
+Test helpers for checking that hot queries are served by indexes.
+
+Query plans only mean something on PostgreSQL, so tests decorated with
+``requires_postgres`` are skipped elsewhere. ``IndexScanTestMixin`` turns
+sequential scans off for the test transaction: on the tiny tables tests
+create the planner would otherwise always prefer them, whereas with
+``enable_seqscan = off`` a sequential scan only remains in the plan when no
+index can serve the query at all. Since any index then beats a sequential
+scan, tests also name the index each table is expected to be read through.
+"""
+import json
+import unittest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+INDEX_SCANS = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+
+def requires_postgres(test_item):
+    return unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks need PostgreSQL')(test_item)
+
+
+def explain(sql):
+    """Return the root plan node of ``EXPLAIN (FORMAT JSON)`` for ``sql``"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]['Plan']
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+class IndexScanTestMixin:
+    def setUp(self):
+        super().setUp()
+        with connection.cursor() as cursor:
+            # Reverted when the test transaction rolls back
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertIndexScans(self, indexes, func, *args, **kwargs):
+        """
+        Run ``func`` and assert every SELECT it issues reads the tables of
+        ``indexes`` (``{table: index name}``) through an index, and that each
+        table was read through its named index at least once
+        """
+        with CaptureQueriesContext(connection) as captured:
+            func(*args, **kwargs)
+
+        tables = set(indexes)
+        scanned, used = set(), set()
+        for query in captured.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            for node in plan_nodes(explain(query['sql'])):
+                # Bitmap scans name the index on a child node, not the heap scan
+                if 'Index Name' in node:
+                    used.add(node['Index Name'])
+                table = node.get('Relation Name')
+                if table not in tables:
+                    continue
+                self.assertIn(
+                    node['Node Type'], INDEX_SCANS,
+                    f"{node['Node Type']} on {table} for query:\n{query['sql']}",
+                )
+                scanned.add(table)
+        self.assertEqual(scanned, tables, 'Some tables were never read')
+        missing = set(indexes.values()) - used
+        self.assertFalse(missing, f"Expected indexes not used: {sorted(missing)} (used: {sorted(used)})")
\ No newline at end of file
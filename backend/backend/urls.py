@@ -19,7 +19,10 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from products.views import ProductViewSet, FeaturedProductsView, CategoryViewSet
+from products.views import (
+    ProductViewSet, FeaturedProductsView, CategoryViewSet,
+    ColorListView, SizeListView, ReferenceDataView, CatalogCacheStatsView
+)
 from authentication.views import RegisterView, LoginView, UserView
 from cart.views import CartViewSet, CartItemViewSet
 from orders.views import OrderViewSet  # Import OrderViewSet
@@ -38,6 +41,10 @@ urlpatterns = [
     path('api/products/featured/', FeaturedProductsView.as_view(), name='featured-products'),
     path('api/', include([
         path('', include(router.urls)),
+        path('colors/', ColorListView.as_view(), name='colors-list'),
+        path('sizes/', SizeListView.as_view(), name='sizes-list'),
+        path('reference-data/', ReferenceDataView.as_view(), name='reference-data'),
+        path('catalog/cache-stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
         path('auth/register/', RegisterView.as_view(), name='register'),
         path('auth/login/', LoginView.as_view(), name='login'),
         path('auth/user/', UserView.as_view(), name='user-profile'),
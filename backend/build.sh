@@ -11,6 +11,12 @@ python manage.py collectstatic --no-input
 # Run migrations
 python manage.py migrate
 
+# Table for the shared cache (CACHE_BACKEND=database)
+python manage.py createcachetable
+
+# Sync denormalized product image columns
+python manage.py backfill_primary_images
+
 # Initialize Cloudinary
 echo "Checking Cloudinary configuration..."
 python init_cloudinary.py
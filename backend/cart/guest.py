@@ -0,0 +1,154 @@
+"""
+Guest carts kept entirely on the client.
+
+A visitor who is not logged in gets their cart back as a signed, compressed
+token (``django.core.signing``) listing ``[id, product, color, size,
+quantity]`` lines. They send it back in the ``X-Cart-Token`` header. No cart
+rows exist until login or registration, when ``merge_guest_cart`` adds the
+lines to the user's cart with one bulk upsert. The token stays valid after a
+merge, so the merge keeps the larger quantity per line rather than adding:
+a retried login with the same token cannot double the cart. Line ids are small integers
+that stay stable while the line exists, so the cart item endpoints work the
+same way for guests.
+"""
+import logging
+from django.conf import settings
+from django.core import signing
+from products.models import Product, Color, Size
+from products.options import get_product_options, option_errors
+from .models import Cart, CartItem
+from .upsert import upsert_items
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = 'cart.guest'
+TOKEN_HEADER = 'X-Cart-Token'
+
+
+def guest_max_lines():
+    return getattr(settings, 'CART_GUEST_MAX_LINES', 50)
+
+
+def guest_token_max_age():
+    return getattr(settings, 'CART_GUEST_TOKEN_MAX_AGE', 30 * 24 * 60 * 60)
+
+
+class GuestCartFull(Exception):
+    def __init__(self):
+        super().__init__(f"A guest cart can hold at most {guest_max_lines()} different items")
+
+
+class GuestCart:
+    def __init__(self, lines=()):
+        # Newest line first, matching the CartItem ordering
+        self.lines = [list(line) for line in lines]
+        # Unsaved CartItems for rendering, set by load_items()
+        self.items = None
+
+    @classmethod
+    def from_token(cls, token):
+        """The cart in ``token``; empty when missing, tampered with or expired"""
+        if not token:
+            return cls()
+        try:
+            lines = signing.loads(token, salt=TOKEN_SALT, max_age=guest_token_max_age())
+            lines = [[int(value) for value in line] for line in lines if len(line) == 5]
+        except (signing.BadSignature, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring invalid guest cart token: {str(e)}")
+            return cls()
+        return cls(line for line in lines if line[4] > 0)
+
+    def load_items(self):
+        """
+        Load the product, color and size of every line (one query per model)
+        into ``items``, dropping lines whose product, color or size was deleted
+        """
+        products = Product.objects.select_related('category').in_bulk({line[1] for line in self.lines})
+        colors = Color.objects.in_bulk({line[2] for line in self.lines})
+        sizes = Size.objects.in_bulk({line[3] for line in self.lines})
+        self.lines = [
+            line for line in self.lines
+            if line[1] in products and line[2] in colors and line[3] in sizes
+        ]
+        self.items = [
+            CartItem(id=item_id, product=products[product_id], color=colors[color_id],
+                     size=sizes[size_id], quantity=quantity)
+            for item_id, product_id, color_id, size_id, quantity in self.lines
+        ]
+        return self.items
+
+    def token(self):
+        return signing.dumps(self.lines, salt=TOKEN_SALT, compress=True)
+
+    def item_ids(self):
+        return {line[0] for line in self.lines}
+
+    def variants(self):
+        """``(product_id, color_id, size_id, quantity)`` per line"""
+        return [tuple(line[1:]) for line in self.lines]
+
+    def add(self, product_id, color_id, size_id, quantity):
+        for line in self.lines:
+            if line[1:4] == [product_id, color_id, size_id]:
+                line[4] += quantity
+                return
+        if len(self.lines) >= guest_max_lines():
+            raise GuestCartFull()
+        item_id = max(self.item_ids(), default=0) + 1
+        self.lines.insert(0, [item_id, product_id, color_id, size_id, quantity])
+
+    def set_quantity(self, item_id, quantity):
+        """Change a line's quantity (0 or less removes it); False if there is no such line"""
+        for line in self.lines:
+            if line[0] == item_id:
+                if quantity <= 0:
+                    self.lines.remove(line)
+                else:
+                    line[4] = quantity
+                return True
+        return False
+
+    def remove(self, item_id):
+        return self.set_quantity(item_id, 0)
+
+    def apply_batch(self, operations):
+        """Same semantics as ``upsert.apply_batch``: changes to existing lines first, then adds"""
+        for operation in operations:
+            if operation['op'] == 'set':
+                self.set_quantity(operation['id'], operation['quantity'])
+            elif operation['op'] == 'remove':
+                self.remove(operation['id'])
+        for operation in operations:
+            if operation['op'] == 'add':
+                self.add(operation['product_id'], operation['color_id'], operation['size_id'], operation['quantity'])
+
+
+def request_cart_token(request):
+    """The guest cart token sent with ``request`` (header, or ``cart_token`` in the body)"""
+    token = request.headers.get(TOKEN_HEADER)
+    if not token and hasattr(request.data, 'get'):
+        token = request.data.get('cart_token')
+    return token
+
+
+def guest_cart(request):
+    return GuestCart.from_token(request_cart_token(request))
+
+
+def merge_guest_cart(user, token):
+    """
+    Merge the lines of a guest cart token into ``user``'s cart with one bulk
+    upsert, skipping lines whose product or options no longer exist; returns
+    the number of lines merged. Idempotent: a line already in the cart keeps
+    the larger quantity.
+    """
+    lines = GuestCart.from_token(token).variants()
+    if not lines:
+        return 0
+    options = get_product_options(product_id for product_id, _, _, _ in lines)
+    lines = [line for line in lines if not option_errors(options, *line[:3])]
+    if not lines:
+        return 0
+    cart, _ = Cart.objects.get_or_create(user=user)
+    upsert_items(cart.pk, lines, keep_larger=True)
+    return len(lines)
@@ -1,7 +1,12 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Cart, CartItem
-from products.models import Product, Color, Size
-from products.serializers import ProductListSerializer, ColorSerializer, SizeSerializer
+from .guest import GuestCart
+from products.options import get_product_options, option_errors
+from products.serializers import (
+    ProductListSerializer, ColorSerializer, SizeSerializer
+)
+from products.images import preset_url
 import logging
 
 # Set up logger
@@ -31,93 +36,138 @@ class CartItemSerializer(serializers.ModelSerializer):
         ]
     
     def get_image(self, obj):
-        request = self.context.get('request')
-        if obj.product.images.exists():
-            image = obj.product.images.first().image
-            if request is not None:
-                return request.build_absolute_uri(image.url)
-            return image.url
-        return None
+        return preset_url(obj.product.primary_image_public_id, 'thumb')
     
     def validate(self, data):
         try:
-            # Validate product exists
-            try:
-                product_id = data.get('product_id')
-                if not product_id:
-                    raise serializers.ValidationError({"product_id": "Product ID is required"})
-                
-                try:
-                    product = Product.objects.get(pk=product_id)
-                except Product.DoesNotExist:
-                    logger.warning(f"Product not found: {product_id}")
-                    raise serializers.ValidationError({"product_id": f"Product with ID {product_id} does not exist"})
-                
-                # Validate color exists and is valid for this product
-                color_id = data.get('color_id')
-                if not color_id:
-                    raise serializers.ValidationError({"color_id": "Color ID is required"})
-                
-                try:
-                    color = Color.objects.get(pk=color_id)
-                    if not product.colors.filter(pk=color_id).exists():
-                        logger.warning(f"Color {color_id} not available for product {product_id}")
-                        raise serializers.ValidationError({
-                            "color_id": f"Color {color.name} is not available for this product"
-                        })
-                except Color.DoesNotExist:
-                    logger.warning(f"Color not found: {color_id}")
-                    raise serializers.ValidationError({"color_id": f"Color with ID {color_id} does not exist"})
-                
-                # Validate size exists and is valid for this product
-                size_id = data.get('size_id')
-                if not size_id:
-                    raise serializers.ValidationError({"size_id": "Size ID is required"})
-                
-                try:
-                    size = Size.objects.get(pk=size_id)
-                    if not product.sizes.filter(pk=size_id).exists():
-                        logger.warning(f"Size {size_id} not available for product {product_id}")
-                        raise serializers.ValidationError({
-                            "size_id": f"Size {size.name} is not available for this product"
-                        })
-                except Size.DoesNotExist:
-                    logger.warning(f"Size not found: {size_id}")
-                    raise serializers.ValidationError({"size_id": f"Size with ID {size_id} does not exist"})
-                
-                # Validate quantity
-                quantity = data.get('quantity', 1)
-                if quantity <= 0:
-                    logger.warning(f"Invalid quantity: {quantity}")
-                    raise serializers.ValidationError({"quantity": "Quantity must be greater than 0"})
-                
-                # Add validated objects to data
-                data['product'] = product
-                data['color'] = color
-                data['size'] = size
-                
-                return data
-            except KeyError as e:
-                logger.error(f"Missing required field: {str(e)}")
-                raise serializers.ValidationError({str(e): f"This field is required"})
+            for field, label in (('product_id', 'Product'), ('color_id', 'Color'), ('size_id', 'Size')):
+                if not data.get(field):
+                    raise serializers.ValidationError({field: f"{label} ID is required"})
             
+            # Validate quantity
+            quantity = data.get('quantity', 1)
+            if quantity <= 0:
+                logger.warning(f"Invalid quantity: {quantity}")
+                raise serializers.ValidationError({"quantity": "Quantity must be greater than 0"})
+            
+            # Membership checks against the cached option matrix
+            product_id = data['product_id']
+            errors = option_errors(get_product_options([product_id]), product_id, data['color_id'], data['size_id'])
+            if errors:
+                logger.warning(f"Invalid options for product {product_id}: {errors}")
+                raise serializers.ValidationError(errors)
+            return data
         except Exception as e:
             logger.error(f"Unexpected error validating cart item: {str(e)}")
             if isinstance(e, serializers.ValidationError):
                 raise
             raise serializers.ValidationError({"error": str(e)})
 
+def cart_items(cart):
+    """
+    The cart's items with everything CartItemSerializer renders, in one query
+    (or none when they were prefetched)
+    """
+    prefetched = getattr(cart, '_prefetched_objects_cache', {}).get('items')
+    if prefetched is not None:
+        return list(prefetched)
+    return list(cart.items.select_related('product__category', 'color', 'size'))
+
+def render_cart(cart_id, items, context=None):
+    """The CartSerializer payload for a materialized list of items"""
+    return {
+        'id': cart_id,
+        'items': CartItemSerializer(items, many=True, context=context).data,
+        'total': sum(item.product.price * item.quantity for item in items),
+        'item_count': sum(item.quantity for item in items),
+    }
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(source='items.all', many=True, read_only=True)
-    total = serializers.SerializerMethodField()
-    item_count = serializers.SerializerMethodField()
+    # Computed by render_cart
+    total = serializers.ReadOnlyField()
+    item_count = serializers.ReadOnlyField()
     
     class Meta:
         model = Cart
         fields = ['id', 'items', 'total', 'item_count']
     
-    def get_total(self, obj):
-        return sum(item.product.price * item.quantity for item in obj.items.all())
+    def to_representation(self, instance):
+        # Load the items once and derive the totals from the same list
+        return render_cart(instance.id, cart_items(instance), self.context)
+
+class GuestCartSerializer(serializers.BaseSerializer):
+    """
+    A GuestCart in the CartSerializer shape plus its ``cart_token``; the cart
+    must have been loaded with ``GuestCart.load_items()``
+    """
+    def to_representation(self, cart):
+        data = render_cart(None, cart.items, self.context)
+        data['cart_token'] = cart.token()
+        return data
+
+class CartOperationSerializer(serializers.Serializer):
+    """
+    One line change in a batch: ``add`` a variant, ``set`` the quantity of a
+    cart item (0 removes it) or ``remove`` a cart item
+    """
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    id = serializers.IntegerField(required=False)
+    product_id = serializers.IntegerField(required=False)
+    color_id = serializers.IntegerField(required=False)
+    size_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False)
+    
+    def validate(self, data):
+        if data['op'] == 'add':
+            required = ['product_id', 'color_id', 'size_id']
+            data.setdefault('quantity', 1)
+            if data['quantity'] <= 0:
+                raise serializers.ValidationError({"quantity": "Quantity must be greater than 0"})
+        elif data['op'] == 'set':
+            required = ['id', 'quantity']
+            if data.get('quantity', 0) < 0:
+                raise serializers.ValidationError({"quantity": "Quantity cannot be negative"})
+        else:
+            required = ['id']
+        missing = {field: "This field is required" for field in required if data.get(field) is None}
+        if missing:
+            raise serializers.ValidationError(missing)
+        return data
+
+class CartBatchSerializer(serializers.Serializer):
+    """
+    Validates a whole batch against the cached option matrix and the cart
+    (or GuestCart) in ``context['cart']``
+    """
+    operations = CartOperationSerializer(many=True, allow_empty=False)
     
-    def get_item_count(self, obj):
-        return sum(item.quantity for item in obj.items.all()) 
\ No newline at end of file
+    def validate_operations(self, operations):
+        max_operations = getattr(settings, 'CART_BATCH_MAX_OPERATIONS', 100)
+        if len(operations) > max_operations:
+            raise serializers.ValidationError(f"At most {max_operations} operations can be applied at once")
+        return operations
+    
+    def validate(self, data):
+        operations = data['operations']
+        adds = [operation for operation in operations if operation['op'] == 'add']
+        options = get_product_options(operation['product_id'] for operation in adds)
+        item_ids = {operation['id'] for operation in operations if operation['op'] != 'add'}
+        cart = self.context['cart']
+        if isinstance(cart, GuestCart):
+            items = cart.item_ids()
+        else:
+            items = set(cart.items.filter(pk__in=item_ids).values_list('id', flat=True))
+        
+        errors = []
+        for operation in operations:
+            error = {}
+            if operation['op'] != 'add':
+                if operation['id'] not in items:
+                    error['id'] = f"Cart item {operation['id']} does not exist"
+            else:
+                error = option_errors(options, operation['product_id'], operation['color_id'], operation['size_id'])
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError({"operations": errors})
+        return data
\ No newline at end of file
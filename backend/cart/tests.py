@@ -0,0 +1,422 @@
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from products.images import preset_url
+from products.models import Category, Color, Product, Size
+from products.options import get_product_options
+from .models import Cart, CartItem
+from .guest import GuestCart, merge_guest_cart
+from .serializers import GuestCartSerializer
+from .upsert import add_item, upsert_items
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CartQueryCountTests(TestCase):
+    """
+    Rendering the cart costs the same number of queries whatever its size
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.colors = [Color.objects.create(name=f"Color {i}", hex_value=f"#00000{i}") for i in range(6)]
+        cls.size = Size.objects.create(name="M")
+        cls.products = []
+        for i in range(2):
+            product = Product.objects.create(
+                name=f"Tee {i}", price='20.00', category=category, primary_image_public_id=f'p/tee-{i}'
+            )
+            product.colors.set(cls.colors)
+            product.sizes.set([cls.size])
+            cls.products.append(product)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        cache.clear()
+        # Validation reads the option matrix from the cache once it is warm
+        get_product_options([product.pk for product in self.products])
+
+    def fill(self, count):
+        """Top the cart up to ``count`` distinct lines of 2 units each"""
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=self.products[i % 2], color=self.colors[i // 2], size=self.size, quantity=2)
+            for i in range(self.cart.items.count(), count)
+        ])
+
+    def queries(self, request):
+        with CaptureQueriesContext(connection) as captured:
+            response = request()
+        self.assertLess(response.status_code, 300)
+        return len(captured)
+
+    def mutation_queries(self):
+        """Queries for an add, an update and a delete against the current cart"""
+        item = self.cart.items.first()
+        return [
+            self.queries(lambda: self.client.post(reverse('cart-item-list'), {
+                'product_id': self.products[0].pk, 'color_id': self.colors[5].pk, 'size_id': self.size.pk,
+            }, format='json')),
+            self.queries(lambda: self.client.patch(
+                reverse('cart-item-detail', args=[item.pk]), {'quantity': 5}, format='json'
+            )),
+            self.queries(lambda: self.client.delete(reverse('cart-item-detail', args=[item.pk]))),
+        ]
+
+    def test_list(self):
+        self.fill(1)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('cart-list'))
+
+        self.fill(10)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('cart-list'))
+        self.assertEqual(len(response.data['items']), 10)
+        self.assertEqual(response.data['item_count'], 20)
+        self.assertEqual(response.data['total'], Decimal('400.00'))
+        item = response.data['items'][0]
+        self.assertEqual(item['product']['category_slug'], "shirts")
+        self.assertEqual(item['image'], preset_url(f"p/tee-{item['name'][-1]}", 'thumb'))
+
+    def test_mutations(self):
+        self.fill(1)
+        small = self.mutation_queries()
+        CartItem.objects.filter(color=self.colors[5]).delete()
+        self.fill(10)
+        self.assertEqual(self.mutation_queries(), small)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CartUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        cls.medium = Size.objects.create(name="M")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=category)
+        cls.tee.colors.set([cls.red])
+        cls.tee.sizes.set([cls.medium])
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, quantity):
+        return add_item(self.user, self.tee.pk, self.red.pk, self.medium.pk, quantity)
+
+    def assertQuantity(self, quantity):
+        item = CartItem.objects.get(cart__user=self.user)
+        self.assertEqual(item.quantity, quantity)
+
+    def test_add_creates_cart_then_increments(self):
+        cart_id = self.add(2)
+        self.assertEqual(Cart.objects.get(user=self.user).pk, cart_id)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.add(3), cart_id)
+        self.assertQuantity(5)
+
+    def test_upsert_many_lines(self):
+        cart_id = self.add(1)
+        blue = Color.objects.create(name="Blue", hex_value="#0000FF")
+        upsert_items(cart_id, [
+            (self.tee.pk, self.red.pk, self.medium.pk, 2),
+            (self.tee.pk, blue.pk, self.medium.pk, 1),
+            (self.tee.pk, blue.pk, self.medium.pk, 1),
+        ])
+        quantities = dict(CartItem.objects.values_list('color__name', 'quantity'))
+        self.assertEqual(quantities, {"Red": 3, "Blue": 2})
+
+    def test_fallback_without_native_upsert(self):
+        with mock.patch('cart.upsert.native_upsert', return_value=False):
+            cart_id = self.add(2)
+            self.add(1)
+            upsert_items(cart_id, [(self.tee.pk, self.red.pk, self.medium.pk, 4)])
+        self.assertQuantity(7)
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {'product_id': self.tee.pk, 'color_id': self.red.pk, 'size_id': self.medium.pk, 'quantity': 2}
+        self.assertEqual(client.post(reverse('cart-item-list'), payload, format='json').status_code, 201)
+        # Warm option matrix: just the upsert and the cart render
+        with self.assertNumQueries(2):
+            response = client.post(reverse('cart-item-list'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['item_count'], 4)
+        self.assertQuantity(4)
+
+        response = client.post(reverse('cart-item-list'), {**payload, 'size_id': 999}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['size_id'][0], "Size with ID 999 does not exist")
+
+
+class CartUpsertConcurrencyTests(TransactionTestCase):
+    """
+    Parallel adds of the same variant must all count
+    """
+    threads = 8
+    adds_per_thread = 5
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache in-memory databases fail concurrent writers instead of waiting
+            self.skipTest("needs a database that serves concurrent connections")
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        self.medium = Size.objects.create(name="M")
+        self.tee = Product.objects.create(name="Tee", price='20.00', category=category)
+
+    def run_in_parallel(self, target):
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.adds_per_thread):
+                    target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_adds(self):
+        self.run_in_parallel(lambda: add_item(self.user, self.tee.pk, self.red.pk, self.medium.pk, 1))
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+        item = CartItem.objects.get(cart__user=self.user)
+        self.assertEqual(item.quantity, self.threads * self.adds_per_thread)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CART_BATCH_MAX_OPERATIONS=30)
+class CartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.colors = [Color.objects.create(name=f"Color {i}", hex_value=f"#00000{i}") for i in range(10)]
+        cls.size = Size.objects.create(name="M")
+        cls.other_size = Size.objects.create(name="XL")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=category)
+        cls.tee.colors.set(cls.colors)
+        cls.tee.sizes.set([cls.size])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.items = CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=self.tee, color=self.colors[i], size=self.size, quantity=1)
+            for i in range(3)
+        ])
+
+    def batch(self, operations):
+        return self.client.post(reverse('cart-batch'), {'operations': operations}, format='json')
+
+    def add(self, color, quantity=1, size=None):
+        return {
+            'op': 'add', 'product_id': self.tee.pk, 'color_id': color.pk,
+            'size_id': (size or self.size).pk, 'quantity': quantity,
+        }
+
+    def quantities(self):
+        return dict(self.cart.items.values_list('color__name', 'quantity'))
+
+    def test_applies_all_operations(self):
+        response = self.batch([
+            {'op': 'set', 'id': self.items[0].pk, 'quantity': 4},
+            {'op': 'remove', 'id': self.items[1].pk},
+            {'op': 'set', 'id': self.items[2].pk, 'quantity': 0},
+            self.add(self.colors[0], 2),
+            self.add(self.colors[5]),
+            self.add(self.colors[5]),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {"Color 0": 6, "Color 5": 2})
+        self.assertEqual(response.data['item_count'], 8)
+
+    def test_queries_do_not_grow_with_operations(self):
+        def queries(operations):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.batch(operations).status_code, 200)
+            return len(captured)
+
+        few = queries([self.add(self.colors[3]), {'op': 'set', 'id': self.items[0].pk, 'quantity': 2}])
+        many = queries(
+            [self.add(color) for color in self.colors]
+            + [{'op': 'set', 'id': item.pk, 'quantity': 3} for item in self.items]
+        )
+        self.assertEqual(few, many)
+
+    def test_invalid_batch_changes_nothing(self):
+        stranger = User.objects.create_user('stranger', 'stranger@example.com', 'secret-pass')
+        foreign = CartItem.objects.create(
+            cart=Cart.objects.create(user=stranger), product=self.tee, color=self.colors[0], size=self.size
+        )
+        response = self.batch([self.add(self.colors[4]), {'op': 'set', 'id': self.items[0].pk}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['operations'][0], {})
+        self.assertEqual(set(response.data['operations'][1]), {'quantity'})
+
+        response = self.batch([
+            self.add(self.colors[4]),
+            self.add(self.colors[4], size=self.other_size),
+            {'op': 'remove', 'id': foreign.pk},
+            {'op': 'set', 'id': self.items[0].pk, 'quantity': 5},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [set(error) for error in response.data['operations']],
+            [set(), {'size_id'}, {'id'}, set()],
+        )
+        self.assertEqual(self.quantities(), {"Color 0": 1, "Color 1": 1, "Color 2": 1})
+        self.assertTrue(CartItem.objects.filter(pk=foreign.pk).exists())
+
+    def test_limits(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([self.add(self.colors[0])] * 31).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CART_GUEST_MAX_LINES=3)
+class GuestCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        cls.blue = Color.objects.create(name="Blue", hex_value="#0000FF")
+        cls.medium = Size.objects.create(name="M")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=category)
+        cls.cap = Product.objects.create(name="Cap", price='10.00', category=category)
+        for product in (cls.tee, cls.cap):
+            product.colors.set([cls.red, cls.blue])
+            product.sizes.set([cls.medium])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.token = None
+
+    def request(self, method, url, data=None, **extra):
+        if self.token:
+            extra['HTTP_X_CART_TOKEN'] = self.token
+        response = getattr(self.client, method)(url, data, format='json', **extra)
+        if 'cart_token' in getattr(response, 'data', {}):
+            self.token = response.data['cart_token']
+        return response
+
+    def add(self, product, color, quantity=1):
+        return self.request('post', reverse('cart-item-list'), {
+            'product_id': product.pk, 'color_id': color.pk, 'size_id': self.medium.pk, 'quantity': quantity,
+        })
+
+    def test_guest_cart_lives_in_the_token(self):
+        self.assertEqual(self.add(self.tee, self.red, 2).status_code, 201)
+        self.add(self.cap, self.red)
+        response = self.add(self.tee, self.red)
+        self.assertEqual(response.data['id'], None)
+        self.assertEqual([(item['name'], item['quantity']) for item in response.data['items']], [("Cap", 1), ("Tee", 3)])
+        self.assertEqual(response.data['total'], Decimal('70.00'))
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+        cap_id = response.data['items'][0]['id']
+        tee_id = response.data['items'][1]['id']
+        response = self.request('patch', reverse('cart-item-detail', args=[tee_id]), {'quantity': 5})
+        self.assertEqual(response.data['item_count'], 6)
+        response = self.request('delete', reverse('cart-item-detail', args=[cap_id]))
+        self.assertEqual([item['id'] for item in response.data['items']], [tee_id])
+        self.assertEqual(self.request('delete', reverse('cart-item-detail', args=[cap_id])).status_code, 404)
+
+        response = self.request('get', reverse('cart-list'))
+        self.assertEqual(response.data['item_count'], 5)
+        self.assertEqual(self.request('post', reverse('cart-clear')).data['items'], [])
+
+    def test_invalid_token_and_limits(self):
+        self.add(self.tee, self.red)
+        self.token = self.token[:-2] + 'xx'
+        self.assertEqual(self.request('get', reverse('cart-list')).data['items'], [])
+
+        self.token = None
+        response = self.request('post', reverse('cart-batch'), {'operations': [
+            {'op': 'add', 'product_id': self.tee.pk, 'color_id': self.red.pk, 'size_id': self.medium.pk},
+            {'op': 'add', 'product_id': self.tee.pk, 'color_id': self.blue.pk, 'size_id': self.medium.pk},
+            {'op': 'add', 'product_id': self.cap.pk, 'color_id': self.red.pk, 'size_id': self.medium.pk},
+        ]})
+        self.assertEqual(response.data['item_count'], 3)
+        self.assertEqual(self.add(self.cap, self.blue).status_code, 400)
+        self.assertEqual(self.add(self.cap, self.red).status_code, 201)
+
+    def test_deleted_products_drop_out(self):
+        self.add(self.tee, self.red)
+        self.add(self.cap, self.red)
+        self.cap.delete()
+        response = self.request('get', reverse('cart-list'))
+        self.assertEqual([item['name'] for item in response.data['items']], ["Tee"])
+        self.assertEqual([line[1] for line in GuestCart.from_token(self.token).lines], [self.tee.pk])
+
+    def test_serializer_leaves_the_cart_alone(self):
+        self.add(self.tee, self.red)
+        self.add(self.cap, self.red)
+        self.cap.delete()
+        cart = GuestCart.from_token(self.token)
+        cart.load_items()
+        lines = [list(line) for line in cart.lines]
+        data = GuestCartSerializer(cart).data
+        self.assertEqual(cart.lines, lines)
+        self.assertEqual(GuestCart.from_token(data['cart_token']).lines, lines)
+
+    def test_merged_on_login(self):
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.tee, color=self.red, size=self.medium, quantity=1)
+        self.add(self.tee, self.red, 2)
+        self.add(self.cap, self.blue)
+
+        credentials = {'email': 'shopper@example.com', 'password': 'secret-pass'}
+        self.assertEqual(self.request('post', reverse('login'), credentials).status_code, 200)
+        quantities = dict(cart.items.values_list('product__name', 'quantity'))
+        self.assertEqual(quantities, {"Tee": 2, "Cap": 1})
+
+        # The token outlives the merge; logging in with it again changes nothing
+        self.assertEqual(self.request('post', reverse('login'), credentials).status_code, 200)
+        self.assertEqual(dict(cart.items.values_list('product__name', 'quantity')), quantities)
+
+    def test_merge_is_idempotent_without_native_upsert(self):
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        self.add(self.tee, self.red, 2)
+        with mock.patch('cart.upsert.native_upsert', return_value=False):
+            merge_guest_cart(user, self.token)
+            merge_guest_cart(user, self.token)
+        self.assertEqual(CartItem.objects.get(cart__user=user).quantity, 2)
+
+    def test_merged_on_register(self):
+        self.add(self.cap, self.blue, 2)
+        response = self.request('post', reverse('register'), {
+            'username': 'newcomer', 'email': 'newcomer@example.com', 'first_name': 'New', 'last_name': 'Comer',
+            'password': 'Secret-pass-123', 'password2': 'Secret-pass-123',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CartItem.objects.get(cart__user__username='newcomer').quantity, 2)
+
+    def test_user_reads_do_not_create_carts(self):
+        user = User.objects.create_user('browser', 'browser@example.com', 'secret-pass')
+        self.client.force_authenticate(user)
+        response = self.request('get', reverse('cart-list'))
+        self.assertEqual((response.data['id'], response.data['items']), (None, []))
+        self.request('post', reverse('cart-clear'))
+        self.assertFalse(Cart.objects.exists())
@@ -0,0 +1,146 @@
+"""
+Atomic add-to-cart and batched cart writes.
+
+Adding a line is one ``INSERT ... ON CONFLICT DO UPDATE SET quantity =
+quantity + n`` statement on the ``unique_product_in_cart`` columns, rather
+than a read followed by a write. Concurrent adds of the same variant (double
+clicks, parallel tabs) all count, and none fail on the unique constraint.
+The cart id comes from a subquery on the user, so no separate cart lookup is
+needed. Databases without ``ON CONFLICT ... RETURNING`` use an ``F()``
+update with a create fallback.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Cart, CartItem
+
+ITEM_TABLE = CartItem._meta.db_table
+CART_TABLE = Cart._meta.db_table
+
+_INSERT = (
+    f"INSERT INTO {ITEM_TABLE} (cart_id, product_id, color_id, size_id, quantity, added_at, updated_at) "
+)
+_ON_CONFLICT = (
+    " ON CONFLICT (cart_id, product_id, color_id, size_id) DO UPDATE SET"
+    " quantity = {quantity}, updated_at = excluded.updated_at"
+)
+_ADD_QUANTITY = _ON_CONFLICT.format(quantity=f"{ITEM_TABLE}.quantity + excluded.quantity")
+
+
+def _keep_larger_quantity():
+    # Two-argument MAX() is SQLite's GREATEST()
+    greatest = 'MAX' if connection.vendor == 'sqlite' else 'GREATEST'
+    return _ON_CONFLICT.format(quantity=f"{greatest}({ITEM_TABLE}.quantity, excluded.quantity)")
+
+
+def native_upsert():
+    features = connection.features
+    return features.supports_update_conflicts_with_target and features.can_return_columns_from_insert
+
+
+def _merged(lines):
+    """Sum ``(product_id, color_id, size_id, quantity)`` lines per variant"""
+    totals = {}
+    for product_id, color_id, size_id, quantity in lines:
+        key = (product_id, color_id, size_id)
+        totals[key] = totals.get(key, 0) + quantity
+    return [(*key, quantity) for key, quantity in totals.items()]
+
+
+def _now():
+    return connection.ops.adapt_datetimefield_value(timezone.now())
+
+
+def upsert_items(cart_id, lines, keep_larger=False):
+    """
+    Add every ``(product_id, color_id, size_id, quantity)`` line to the cart,
+    increasing the quantity of lines already in it, in one statement. With
+    ``keep_larger`` a line already in the cart keeps the larger of the two
+    quantities instead, so applying the same lines twice changes nothing.
+    """
+    lines = _merged(lines)
+    if not lines:
+        return
+    if not native_upsert():
+        with transaction.atomic():
+            for line in lines:
+                _add_with_update(cart_id, *line, keep_larger=keep_larger)
+        return
+    now = _now()
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(lines))
+    params = [value for line in lines for value in (cart_id, *line, now, now)]
+    on_conflict = _keep_larger_quantity() if keep_larger else _ADD_QUANTITY
+    with connection.cursor() as cursor:
+        cursor.execute(_INSERT + f"VALUES {values}" + on_conflict, params)
+
+
+def apply_batch(cart_id, operations):
+    """
+    Apply validated batch operations to a cart in one transaction: quantity
+    changes and removals of existing items first, then adds. That is at most
+    three writes however many operations there are.
+    """
+    quantities = {}
+    for operation in operations:
+        if operation['op'] == 'set':
+            quantities[operation['id']] = operation['quantity']
+        elif operation['op'] == 'remove':
+            quantities[operation['id']] = 0
+    removed = [item_id for item_id, quantity in quantities.items() if quantity <= 0]
+    now = timezone.now()
+    updated = [
+        CartItem(pk=item_id, quantity=quantity, updated_at=now)
+        for item_id, quantity in quantities.items() if quantity > 0
+    ]
+    adds = [
+        (operation['product_id'], operation['color_id'], operation['size_id'], operation['quantity'])
+        for operation in operations if operation['op'] == 'add'
+    ]
+    with transaction.atomic():
+        if removed:
+            CartItem.objects.filter(cart_id=cart_id, pk__in=removed).delete()
+        if updated:
+            CartItem.objects.bulk_update(updated, ['quantity', 'updated_at'])
+        upsert_items(cart_id, adds)
+
+
+def add_item(user, product_id, color_id, size_id, quantity):
+    """
+    Add ``quantity`` units of a variant to ``user``'s cart, creating the cart
+    if needed; returns the cart id
+    """
+    if not native_upsert():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        _add_with_update(cart.pk, product_id, color_id, size_id, quantity)
+        return cart.pk
+    now = _now()
+    with connection.cursor() as cursor:
+        # WHERE also keeps SQLite from reading ON CONFLICT as a join clause
+        cursor.execute(
+            _INSERT + f"SELECT id, %s, %s, %s, %s, %s, %s FROM {CART_TABLE} WHERE user_id = %s"
+            + _ADD_QUANTITY + " RETURNING cart_id",
+            [product_id, color_id, size_id, quantity, now, now, user.pk],
+        )
+        row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    # First add for this user: nothing was inserted because there is no cart yet
+    cart, _ = Cart.objects.get_or_create(user=user)
+    upsert_items(cart.pk, [(product_id, color_id, size_id, quantity)])
+    return cart.pk
+
+
+def _add_with_update(cart_id, product_id, color_id, size_id, quantity, keep_larger=False):
+    items = CartItem.objects.filter(cart_id=cart_id, product_id=product_id, color_id=color_id, size_id=size_id)
+    new_quantity = Greatest('quantity', quantity) if keep_larger else F('quantity') + quantity
+    if items.update(quantity=new_quantity, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(
+                cart_id=cart_id, product_id=product_id, color_id=color_id, size_id=size_id, quantity=quantity
+            )
+    except IntegrityError:
+        # A concurrent add created the line first
+        items.update(quantity=new_quantity, updated_at=timezone.now())
@@ -1,22 +1,48 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
-from products.models import Product, Color, Size
+from .serializers import (
+    CartSerializer, CartItemSerializer, CartBatchSerializer, GuestCartSerializer, render_cart
+)
+from .guest import GuestCart, GuestCartFull, guest_cart
+from .upsert import add_item, apply_batch
 import logging
 from rest_framework.authentication import TokenAuthentication, SessionAuthentication
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Everything CartItemSerializer renders, loaded with the cart
+CART_ITEMS = Prefetch('items', queryset=CartItem.objects.select_related('product__category', 'color', 'size'))
+
+def user_cart_data(request):
+    """
+    The user's cart in the CartSerializer shape, read without creating a
+    cart row for users who never added anything
+    """
+    cart = Cart.objects.filter(user=request.user).prefetch_related(CART_ITEMS).first()
+    if cart is None:
+        return render_cart(None, [], {'request': request})
+    return CartSerializer(cart, context={'request': request}).data
+
+def guest_cart_data(request, cart):
+    """
+    A guest cart in the CartSerializer shape plus its new ``cart_token``;
+    lines whose product, color or size was deleted are dropped from both
+    """
+    cart.load_items()
+    return GuestCartSerializer(cart, context={'request': request}).data
+
 class CartViewSet(viewsets.GenericViewSet):
     """
-    API endpoint for managing user's shopping cart
+    API endpoint for managing the shopping cart; visitors who are not logged
+    in get a guest cart carried in a signed token
     """
     authentication_classes = [TokenAuthentication, SessionAuthentication]
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
     serializer_class = CartSerializer
     
     def get_queryset(self):
@@ -24,7 +50,6 @@ class CartViewSet(viewsets.GenericViewSet):
         This should never return multiple carts per user
         """
         if not self.request.user.is_authenticated:
-            logger.warning("Unauthenticated user attempted to access cart")
             return Cart.objects.none()
         return Cart.objects.filter(user=self.request.user)
     
@@ -48,26 +73,12 @@ class CartViewSet(viewsets.GenericViewSet):
     
     def list(self, request):
         """
-        Retrieve the user's cart
+        Retrieve the cart
         """
         try:
-            # Ensure user is authenticated
             if not request.user.is_authenticated:
-                logger.warning("Unauthenticated user attempted to list cart")
-                return Response(
-                    {"error": "Authentication required"}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-                
-            cart = self.get_object()
-            if not cart:
-                return Response(
-                    {"error": "Could not retrieve cart"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-                
-            serializer = self.get_serializer(cart, context={'request': request})
-            return Response(serializer.data)
+                return Response(guest_cart_data(request, guest_cart(request)))
+            return Response(user_cart_data(request))
         except Exception as e:
             logger.error(f"Error retrieving cart: {str(e)}")
             return Response(
@@ -81,24 +92,11 @@ class CartViewSet(viewsets.GenericViewSet):
         Clear all items from the cart
         """
         try:
-            # Ensure user is authenticated
             if not request.user.is_authenticated:
-                logger.warning("Unauthenticated user attempted to clear cart")
-                return Response(
-                    {"error": "Authentication required"}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
+                return Response(guest_cart_data(request, GuestCart()))
                 
-            cart = self.get_object()
-            if not cart:
-                return Response(
-                    {"error": "Could not retrieve cart"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-                
-            cart.items.all().delete()
-            serializer = self.get_serializer(cart, context={'request': request})
-            return Response(serializer.data)
+            CartItem.objects.filter(cart__user=request.user).delete()
+            return Response(user_cart_data(request))
         except Exception as e:
             logger.error(f"Error clearing cart: {str(e)}")
             return Response(
@@ -106,37 +104,57 @@ class CartViewSet(viewsets.GenericViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Apply a list of add / set / remove operations in one transaction and
+        return the resulting cart
+        """
+        try:
+            if request.user.is_authenticated:
+                cart = self.get_object()
+                if not cart:
+                    return Response(
+                        {"error": "Could not retrieve cart"},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
+            else:
+                cart = guest_cart(request)
+            
+            batch = CartBatchSerializer(data=request.data, context={'request': request, 'cart': cart})
+            if not batch.is_valid():
+                logger.warning(f"Invalid cart batch: {batch.errors}")
+                return Response(batch.errors, status=status.HTTP_400_BAD_REQUEST)
+            
+            if isinstance(cart, GuestCart):
+                cart.apply_batch(batch.validated_data['operations'])
+                return Response(guest_cart_data(request, cart))
+
+            apply_batch(cart.pk, batch.validated_data['operations'])
+            serializer = self.get_serializer(cart, context={'request': request})
+            return Response(serializer.data)
+        except GuestCartFull as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error applying cart batch: {str(e)}")
+            return Response(
+                {"error": "Could not update the cart"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class CartItemViewSet(viewsets.GenericViewSet):
     """
-    API endpoint for managing cart items
+    API endpoint for managing cart items, for users and guest carts alike
     """
     authentication_classes = [TokenAuthentication, SessionAuthentication]
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
     serializer_class = CartItemSerializer
     
-    def get_cart(self):
-        """
-        Get or create a cart for the current user
-        """
-        if not self.request.user.is_authenticated:
-            logger.warning("Unauthenticated user attempted to get cart")
-            return None
-            
-        try:
-            cart, created = Cart.objects.get_or_create(user=self.request.user)
-            if created:
-                logger.info(f"Created new cart for user {self.request.user.id}")
-            return cart
-        except Exception as e:
-            logger.error(f"Error getting cart: {str(e)}")
-            return None
-    
     def get_queryset(self):
         """
         Get all cart items for the current user's cart
         """
         if not self.request.user.is_authenticated:
-            logger.warning("Unauthenticated user attempted to access cart items")
             return CartItem.objects.none()
         return CartItem.objects.filter(cart__user=self.request.user)
     
@@ -145,22 +163,6 @@ class CartItemViewSet(viewsets.GenericViewSet):
         Add an item to the cart
         """
         try:
-            # Ensure user is authenticated
-            if not request.user.is_authenticated:
-                logger.warning("Unauthenticated user attempted to add to cart")
-                return Response(
-                    {"error": "Authentication required"}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-                
-            # Get the user's cart
-            cart = self.get_cart()
-            if not cart:
-                return Response(
-                    {"error": "Could not access cart"}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-                
             # Log the incoming request data
             logger.info(f"Add to cart request data: {request.data}")
             
@@ -171,54 +173,30 @@ class CartItemViewSet(viewsets.GenericViewSet):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
             # Get validated data
-            try:
-                product = serializer.validated_data['product']
-                color = serializer.validated_data['color']
-                size = serializer.validated_data['size']
-                quantity = serializer.validated_data.get('quantity', 1)
-            except KeyError as e:
-                logger.error(f"Missing required field in cart item data: {e}")
-                return Response(
-                    {"error": f"Missing required field: {e}"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            product_id = serializer.validated_data['product_id']
+            color_id = serializer.validated_data['color_id']
+            size_id = serializer.validated_data['size_id']
+            quantity = serializer.validated_data.get('quantity', 1)
             
             # Debug logs
-            logger.info(f"Adding to cart: product={product.id}, color={color.id}, size={size.id}, quantity={quantity}")
+            logger.info(f"Adding to cart: product={product_id}, color={color_id}, size={size_id}, quantity={quantity}")
             
-            # Check if the item already exists in the cart
-            try:
-                cart_item = CartItem.objects.get(
-                    cart=cart,
-                    product=product,
-                    color=color,
-                    size=size
-                )
-                # Update quantity if item exists
-                logger.info(f"Item already exists in cart, updating quantity from {cart_item.quantity} to {cart_item.quantity + quantity}")
-                cart_item.quantity += quantity
-                cart_item.save()
-            except CartItem.DoesNotExist:
-                # Create new item if it doesn't exist
-                logger.info(f"Creating new cart item")
-                cart_item = CartItem.objects.create(
-                    cart=cart,
-                    product=product,
-                    color=color,
-                    size=size,
-                    quantity=quantity
-                )
-            except Exception as e:
-                logger.error(f"Error processing cart item: {str(e)}")
-                return Response(
-                    {"error": f"Error processing cart item: {str(e)}"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            if not request.user.is_authenticated:
+                cart = guest_cart(request)
+                cart.add(product_id, color_id, size_id, quantity)
+                return Response(guest_cart_data(request, cart), status=status.HTTP_201_CREATED)
+
+            # One statement adds the line or increases its quantity, creating
+            # the cart on first use
+            cart_id = add_item(request.user, product_id, color_id, size_id, quantity)
+            cart = Cart(pk=cart_id, user=request.user)
             
             # Return the updated cart
             cart_serializer = CartSerializer(cart, context={'request': request})
             return Response(cart_serializer.data, status=status.HTTP_201_CREATED)
             
+        except GuestCartFull as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error adding item to cart: {str(e)}")
             return Response(
@@ -231,13 +209,21 @@ class CartItemViewSet(viewsets.GenericViewSet):
         Update a cart item's quantity
         """
         try:
-            # Ensure user is authenticated
-            if not request.user.is_authenticated:
-                logger.warning("Unauthenticated user attempted to update cart item")
+            # Only quantity can be updated
+            try:
+                quantity = int(request.data.get('quantity', 1))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Invalid quantity value: {request.data.get('quantity')}")
                 return Response(
-                    {"error": "Authentication required"}, 
-                    status=status.HTTP_401_UNAUTHORIZED
+                    {"error": "Invalid quantity value"},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
+
+            if not request.user.is_authenticated:
+                cart = guest_cart(request)
+                if not str(pk).isdigit() or not cart.set_quantity(int(pk), quantity):
+                    return Response({"error": "Cart item not found"}, status=status.HTTP_404_NOT_FOUND)
+                return Response(guest_cart_data(request, cart))
             
             # Get the cart item, ensuring it belongs to the current user
             try:
@@ -248,16 +234,6 @@ class CartItemViewSet(viewsets.GenericViewSet):
                     {"error": "Cart item not found"}, 
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            # Only quantity can be updated
-            try:
-                quantity = int(request.data.get('quantity', 1))
-            except (TypeError, ValueError) as e:
-                logger.warning(f"Invalid quantity value: {request.data.get('quantity')}")
-                return Response(
-                    {"error": "Invalid quantity value"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
                 
             if quantity <= 0:
                 # If quantity is 0 or less, remove the item
@@ -270,9 +246,7 @@ class CartItemViewSet(viewsets.GenericViewSet):
                 cart_item.save()
             
             # Return the updated cart
-            cart = self.get_cart()
-            cart_serializer = CartSerializer(cart, context={'request': request})
-            return Response(cart_serializer.data)
+            return Response(user_cart_data(request))
         except CartItem.DoesNotExist:
             logger.warning(f"Cart item not found: {pk}")
             return Response({"error": "Cart item not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -294,13 +268,11 @@ class CartItemViewSet(viewsets.GenericViewSet):
         Remove an item from the cart
         """
         try:
-            # Ensure user is authenticated
             if not request.user.is_authenticated:
-                logger.warning("Unauthenticated user attempted to remove cart item")
-                return Response(
-                    {"error": "Authentication required"}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
+                cart = guest_cart(request)
+                if not str(pk).isdigit() or not cart.remove(int(pk)):
+                    return Response({"error": "Cart item not found"}, status=status.HTTP_404_NOT_FOUND)
+                return Response(guest_cart_data(request, cart))
             
             # Get the cart item, ensuring it belongs to the current user    
             try:
@@ -316,9 +288,7 @@ class CartItemViewSet(viewsets.GenericViewSet):
             cart_item.delete()
             
             # Return the updated cart
-            cart = self.get_cart()
-            cart_serializer = CartSerializer(cart, context={'request': request})
-            return Response(cart_serializer.data)
+            return Response(user_cart_data(request))
         except CartItem.DoesNotExist:
             logger.warning(f"Cart item not found to delete: {pk}")
             return Response({"error": "Cart item not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -327,4 +297,4 @@ class CartItemViewSet(viewsets.GenericViewSet):
             return Response(
                 {"error": f"Could not remove item from cart: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            ) 
\ No newline at end of file
+            ) 
@@ -28,6 +28,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # A user's order history, newest first, with id as tie-breaker
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_id_idx'),
+            # OrderViewSet.current: a user's newest order in a given status
+            models.Index(fields=['user', 'status', 'created_at'], name='order_user_status_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
     
@@ -1,7 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem
 from products.models import Product, Color, Size
 from cart.models import Cart
+from products.images import preset_url
+from products.inventory import OutOfStock, reserve_stock, sync_in_stock
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -19,15 +22,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['price', 'subtotal']
     
     def get_product_image(self, obj):
-        primary_image = obj.product.images.filter(is_primary=True).first()
-        if not primary_image:
-            primary_image = obj.product.images.first()
-        if primary_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(primary_image.image.url)
-            return primary_image.image.url
-        return None
+        return preset_url(obj.product.primary_image_public_id, 'thumb')
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -69,28 +64,39 @@ class OrderSerializer(serializers.ModelSerializer):
         
         # Create the order
         try:
-            order = Order.objects.create(
-                user=user,
-                shipping_price=shipping_price,
-                **cleaned_data
-            )
-            
-            # Create order items from cart items
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    color=cart_item.color,
-                    size=cart_item.size,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
+            with transaction.atomic():
+                order = Order.objects.create(
+                    user=user,
+                    shipping_price=shipping_price,
+                    **cleaned_data
                 )
-            
-            # Clear the cart
-            cart.items.all().delete()
+                
+                # Create order items from cart items
+                cart_items = list(cart.items.all())
+                for cart_item in cart_items:
+                    OrderItem.objects.create(
+                        order=order,
+                        product=cart_item.product,
+                        color=cart_item.color,
+                        size=cart_item.size,
+                        quantity=cart_item.quantity,
+                        price=cart_item.product.price
+                    )
+                
+                # Reserved last so the stock rows stay locked only until the commit
+                reserve_stock([
+                    (item.product_id, item.color_id, item.size_id, item.quantity) for item in cart_items
+                ])
+                sync_in_stock([item.product_id for item in cart_items])
+                
+                # Clear the cart
+                cart.items.all().delete()
             
             return order
+        except OutOfStock:
+            # The view answers with the unavailable lines as they are
+            raise
         except Exception as e:
             print(f"Error creating order: {e}")
             print(f"Validated data: {cleaned_data}")
-            raise serializers.ValidationError(f"Failed to create order: {str(e)}") 
\ No newline at end of file
+            raise serializers.ValidationError(f"Failed to create order: {str(e)}")
\ No newline at end of file
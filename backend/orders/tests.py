@@ -1,3 +1,123 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from backend.testing import IndexScanTestMixin, requires_postgres
+from cart.models import Cart, CartItem
+from products.cache import get_catalog_version
+from products.models import Category, Color, Product, ProductStock, Size
+from .models import Order
 
-# Create your tests here.
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OrderKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        other = User.objects.create_user('other', 'other@example.com', 'secret-pass')
+        for owner in [cls.user] * 15 + [other] * 3:
+            Order.objects.create(
+                user=owner, payment_method='credit_card', shipping_address='Somewhere', total_price='10.00'
+            )
+
+    def test_cursor_pages_newest_first_without_count(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('order-list'), {'pagination': 'cursor'})
+        ids = [row['id'] for row in response.data['results']]
+        self.assertNotIn('count', response.data)
+
+        # One query for the page, one each for the items of every order
+        with self.assertNumQueries(1 + 3):
+            response = client.get(response.data['next'])
+        ids += [row['id'] for row in response.data['results']]
+
+        expected = list(Order.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertIsNone(response.data['next'])
+
+
+@requires_postgres
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OrderIndexUsageTests(IndexScanTestMixin, TestCase):
+    def test_current_order(self):
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        for status in ['delivered', 'pending', 'cancelled']:
+            Order.objects.create(
+                user=user, status=status, payment_method='credit_card',
+                shipping_address='Somewhere', total_price='10.00',
+            )
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertIndexScans({'orders_order': 'order_user_status_created_idx'}, client.get, reverse('order-current'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CheckoutStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        cls.medium = Size.objects.create(name="M")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=category)
+        cls.cap = Product.objects.create(name="Cap", price='10.00', category=category)
+        cls.stock = ProductStock.objects.create(product=cls.tee, color=cls.red, size=cls.medium, quantity=3)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add(self, product, quantity):
+        CartItem.objects.create(cart=self.cart, product=product, color=self.red, size=self.medium, quantity=quantity)
+
+    def checkout(self):
+        return self.client.post(reverse('order-checkout'), {
+            'payment_method': 'credit_card', 'shipping_address': 'Somewhere', 'total_price': '0.00',
+        }, format='json')
+
+    def test_reserves_tracked_variants_and_derives_in_stock(self):
+        self.add(self.tee, 3)
+        # Untracked variants can always be ordered
+        self.add(self.cap, 5)
+        self.assertEqual(self.checkout().status_code, 201)
+        self.stock.refresh_from_db()
+        self.tee.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 0)
+        self.assertFalse(self.tee.in_stock)
+        self.assertFalse(self.cart.items.exists())
+
+    def test_catalog_invalidated_after_commit(self):
+        cache.clear()
+        version = get_catalog_version()
+        self.add(self.tee, 3)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(get_catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_short_stock_rolls_back_everything(self):
+        self.add(self.cap, 1)
+        self.add(self.tee, 4)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['unavailable'][0]['available'], 3)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 3)
+
+    def test_cancel_releases_stock_once(self):
+        self.add(self.tee, 3)
+        order_id = self.checkout().data['order']['id']
+        url = reverse('order-cancel', args=[order_id])
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.stock.refresh_from_db()
+        self.tee.refresh_from_db()
+        self.assertEqual(self.stock.quantity, 3)
+        self.assertTrue(self.tee.in_stock)
\ No newline at end of file
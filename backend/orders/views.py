@@ -3,9 +3,13 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.utils import timezone
 from .models import Order
 from .serializers import OrderSerializer
 from cart.models import Cart
+from products.inventory import OutOfStock, release_stock, sync_in_stock
+from backend.pagination import OptionalKeysetPagination
 
 # Create your views here.
 
@@ -15,12 +19,15 @@ class OrderViewSet(viewsets.ModelViewSet):
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OptionalKeysetPagination
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
     
     def get_queryset(self):
         """
         Return only orders for the current authenticated user
         """
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return Order.objects.filter(user=self.request.user).order_by('-created_at', '-id')
     
     def perform_create(self, serializer):
         """
@@ -49,9 +56,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         Cancel an order if it's still in 'pending' or 'processing' status
         """
         order = self.get_object()
-        if order.status in ['pending', 'processing']:
-            order.status = 'cancelled'
-            order.save()
+        with transaction.atomic():
+            # Conditional update, so concurrent cancels release the stock only once
+            cancelled = Order.objects.filter(
+                pk=order.pk, status__in=['pending', 'processing']
+            ).update(status='cancelled', updated_at=timezone.now())
+            if cancelled:
+                lines = list(order.items.values_list('product_id', 'color_id', 'size_id', 'quantity'))
+                release_stock(lines)
+                sync_in_stock([line[0] for line in lines])
+        if cancelled:
             return Response({"status": "Order cancelled successfully"})
         return Response(
             {"detail": "Cannot cancel an order that has already been shipped or delivered."},
@@ -74,7 +88,14 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Create the order
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        order = serializer.save()
+        try:
+            order = serializer.save()
+        except OutOfStock as e:
+            # Not a ValidationError, which would turn the quantities into strings
+            return Response(
+                {"detail": str(e), "unavailable": e.lines},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response(
             {"detail": "Order created successfully.", "order": serializer.data},
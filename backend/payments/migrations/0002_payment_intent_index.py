@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-17 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['stripe_payment_intent_id'], name='payment_intent_idx'),
+        ),
+    ]
@@ -19,5 +19,11 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Payment confirmation and Stripe webhooks look payments up by intent
+            models.Index(fields=['stripe_payment_intent_id'], name='payment_intent_idx'),
+        ]
+    
     def __str__(self):
         return f"Payment {self.id} for Order {self.order.id} - {self.status}"
@@ -1,3 +1,19 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from backend.testing import IndexScanTestMixin, requires_postgres
+from orders.models import Order
+from .models import Payment
 
-# Create your tests here.
+
+@requires_postgres
+class PaymentIndexUsageTests(IndexScanTestMixin, TestCase):
+    def test_lookup_by_payment_intent(self):
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        for i in range(5):
+            order = Order.objects.create(
+                user=user, payment_method='credit_card', shipping_address='Somewhere', total_price='10.00'
+            )
+            Payment.objects.create(order=order, amount='10.00', stripe_payment_intent_id=f'pi_{i}')
+        self.assertIndexScans(
+            {'payments_payment': 'payment_intent_idx'}, lambda: Payment.objects.get(stripe_payment_intent_id='pi_3')
+        )
\ No newline at end of file
@@ -1,10 +1,14 @@
 from django.contrib import admin
-from .models import Category, Color, Size, Product, ProductImage
+from .models import Category, Color, Size, Product, ProductImage, ProductStock
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
 
+class ProductStockInline(admin.TabularInline):
+    model = ProductStock
+    extra = 1
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     def category_list(self, obj):
@@ -14,7 +18,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'price', 'category', 'is_new', 'is_featured', 'in_stock')
     list_filter = ('category', 'is_new', 'is_featured', 'in_stock')
     search_fields = ('name', 'description')
-    inlines = [ProductImageInline]
+    inlines = [ProductImageInline, ProductStockInline]
     filter_horizontal = ('colors', 'sizes')
 
 @admin.register(Category)
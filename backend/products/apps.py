@@ -0,0 +1,16 @@
+import logging
+from django.apps import AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ProductsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'products'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .checks import check_shared_cache
+        # Servers such as gunicorn don't run system checks, so log it as well
+        for warning in check_shared_cache():
+            logger.warning(f"{warning.msg} {warning.hint}")
@@ -0,0 +1,98 @@
+"""
+Helpers shared by the ``benchmark_*`` management commands.
+
+Benchmarks build a synthetic catalog inside a transaction that is always
+rolled back, so they can be pointed at a development database without
+leaving data behind.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import transaction
+from .cache import bump_catalog_version
+from .models import Category, Color, Size, Product
+
+WORDS = [
+    'classic', 'cotton', 'slim', 'relaxed', 'linen', 'denim', 'leather', 'wool',
+    'summer', 'winter', 'oversized', 'cropped', 'vintage', 'athletic', 'casual',
+    'formal', 'striped', 'graphic', 'organic', 'waterproof', 'lightweight',
+]
+GARMENTS = ['shirt', 'tee', 'jacket', 'hoodie', 'trousers', 'shorts', 'sneakers', 'boots', 'cap', 'dress']
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def synthetic_catalog(size, categories=8, colors=12, sizes=8, colors_per_product=3,
+                      sizes_per_product=4, seed=42, batch_size=2000):
+    """
+    Yield after creating ``size`` products with random names, prices and
+    colour/size sets; everything is rolled back on exit
+    """
+    rng = random.Random(seed)
+    try:
+        with transaction.atomic():
+            category_objs = Category.objects.bulk_create([
+                Category(name=f'Bench {GARMENTS[i % len(GARMENTS)]} {i}', slug=f'bench-category-{i}')
+                for i in range(categories)
+            ])
+            color_objs = Color.objects.bulk_create([
+                Color(name=f'Bench color {i}', hex_value=f'#{i:06x}') for i in range(colors)
+            ])
+            size_objs = Size.objects.bulk_create([Size(name=f'B{i}') for i in range(sizes)])
+
+            products = Product.objects.bulk_create([
+                Product(
+                    name=' '.join(rng.sample(WORDS, 2) + [rng.choice(GARMENTS)]).title(),
+                    # The style code gives benchmarks a selective term to search for
+                    description=' '.join(rng.choices(WORDS + GARMENTS, k=20) + [f'style aw{i}']),
+                    price=Decimal(rng.randrange(19900, 999900)) / 100,
+                    category=rng.choice(category_objs),
+                    is_new=rng.random() < 0.2,
+                    is_featured=rng.random() < 0.02,
+                    in_stock=rng.random() < 0.9,
+                    discount_percentage=rng.choice([None, None, None, 10, 20, 30]),
+                )
+                for i in range(size)
+            ], batch_size=batch_size)
+
+            color_links = [
+                Product.colors.through(product_id=product.pk, color_id=color.pk)
+                for product in products
+                for color in rng.sample(color_objs, min(colors_per_product, len(color_objs)))
+            ]
+            Product.colors.through.objects.bulk_create(color_links, batch_size=batch_size)
+            size_links = [
+                Product.sizes.through(product_id=product.pk, size_id=size_obj.pk)
+                for product in products
+                for size_obj in rng.sample(size_objs, min(sizes_per_product, len(size_objs)))
+            ]
+            Product.sizes.through.objects.bulk_create(size_links, batch_size=batch_size)
+
+            # bulk_create skips the signals, so invalidate catalog caches by hand
+            bump_catalog_version()
+            yield {
+                'products': products,
+                'categories': category_objs,
+                'colors': color_objs,
+                'sizes': size_objs,
+            }
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        bump_catalog_version()
+
+
+def timed(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return (median, best) in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
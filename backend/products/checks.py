@@ -0,0 +1,25 @@
+"""
+Startup checks for catalog caching.
+
+Catalog versions, cached responses and their invalidation live in the
+default cache. With a per-process backend every worker keeps its own
+version, so workers disagree on ETags and keep serving cached responses for
+up to ``CATALOG_CACHE_TIMEOUT`` after a write made in another worker.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PER_PROCESS_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        f"The default cache ({backend}) is per process: with several workers, "
+        "catalog writes are not seen by the other workers' caches.",
+        hint="Set CACHE_BACKEND=database (and run createcachetable) or configure another shared cache.",
+        id='products.W001',
+    )]
@@ -0,0 +1,95 @@
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+from .cache import get_catalog_version, catalog_cache_key, catalog_cache_timeout
+
+RESPONSE_CACHE_HITS_KEY = 'catalog:response-cache:hits'
+RESPONSE_CACHE_MISSES_KEY = 'catalog:response-cache:misses'
+
+
+def catalog_etag(version):
+    return f'W/"catalog-{version}"'
+
+
+def conditional_catalog_response(view_method):
+    """
+    Answer ``If-None-Match`` with a 304 derived from the catalog version
+    before the wrapped view touches a queryset, and tag successful responses
+    with an ``ETag``. There is no ``Last-Modified``: its one-second resolution
+    would answer 304 after a second write within the same second.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_method(self, request, *args, **kwargs)
+
+        version = get_catalog_version()
+        etag = catalog_etag(version)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+    return wrapper
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing (first use or evicted); add() keeps concurrent first hits safe
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def response_cache_stats():
+    """Hit and miss counters for the catalog response cache"""
+    counts = cache.get_many([RESPONSE_CACHE_HITS_KEY, RESPONSE_CACHE_MISSES_KEY])
+    return {
+        'hits': counts.get(RESPONSE_CACHE_HITS_KEY, 0),
+        'misses': counts.get(RESPONSE_CACHE_MISSES_KEY, 0),
+    }
+
+
+def response_cache_key(request):
+    """Key for a request's URL and query parameters under the current catalog version"""
+    # Scheme and host are part of the key because pagination links are absolute
+    url = request.build_absolute_uri(request.path)
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    digest = hashlib.md5(repr((url, params)).encode()).hexdigest()
+    return catalog_cache_key('response', digest)
+
+
+def cached_catalog_response(view_method):
+    """
+    Serve the wrapped catalog view's serialized data from the cache, keyed by
+    path, normalized query parameters and catalog version; any catalog write
+    bumps the version so nothing stale is ever served
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not getattr(settings, 'CATALOG_RESPONSE_CACHE', True):
+            return view_method(self, request, *args, **kwargs)
+
+        key = response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _count(RESPONSE_CACHE_HITS_KEY)
+            response = Response(data)
+            response['X-Catalog-Cache'] = 'hit'
+            return response
+
+        _count(RESPONSE_CACHE_MISSES_KEY)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, response.data, catalog_cache_timeout())
+        response['X-Catalog-Cache'] = 'miss'
+        return response
+    return wrapper
@@ -0,0 +1,111 @@
+"""
+Facet counts for the product listing.
+
+Counts are computed with grouped aggregate queries over the filtered
+product ids, never by loading products into Python.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .cache import catalog_cache_key, catalog_cache_timeout
+from .models import Product
+
+# Upper bounds of the price buckets; the last bucket is open-ended
+DEFAULT_PRICE_BUCKETS = [500, 1000, 2500, 5000]
+
+# Query parameters that never change which products match
+IGNORED_PARAMS = {'page', 'page_size', 'ordering', 'format', 'pagination', 'cursor'}
+
+
+def facet_cache_key(query_params):
+    """Cache key for a filter combination, independent of parameter order"""
+    normalized = sorted(
+        (key, sorted(values))
+        for key, values in query_params.lists()
+        if key not in IGNORED_PARAMS and any(values)
+    )
+    digest = hashlib.md5(repr(normalized).encode()).hexdigest()
+    return catalog_cache_key('facets', digest)
+
+
+def price_buckets():
+    bounds = getattr(settings, 'PRODUCT_FACET_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS)
+    edges = [None, *bounds, None]
+    return list(zip(edges, edges[1:]))
+
+
+def _price_condition(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def compute_facets(queryset):
+    """
+    Return facet counts for the products in ``queryset`` using four
+    aggregate queries (totals, categories, colors, sizes)
+    """
+    # Re-select by id so joins made by the filters can't inflate the counts
+    products = Product.objects.filter(pk__in=queryset.order_by().values('pk'))
+    buckets = price_buckets()
+
+    aggregates = {
+        'total': Count('id'),
+        'is_new': Count('id', filter=Q(is_new=True)),
+        'in_stock': Count('id', filter=Q(in_stock=True)),
+    }
+    for index, (low, high) in enumerate(buckets):
+        aggregates[f'price_{index}'] = Count('id', filter=_price_condition(low, high))
+    totals = products.aggregate(**aggregates)
+    total = totals['total']
+
+    categories = products.values(
+        'category_id', 'category__name', 'category__slug'
+    ).annotate(count=Count('id')).order_by('category__name')
+
+    colors = Product.colors.through.objects.filter(product__in=products).values(
+        'color_id', 'color__name', 'color__hex_value'
+    ).annotate(count=Count('product_id')).order_by('color__name')
+
+    sizes = Product.sizes.through.objects.filter(product__in=products).values(
+        'size_id', 'size__name', 'size__size_type'
+    ).annotate(count=Count('product_id')).order_by('size__name')
+
+    return {
+        'total': total,
+        'categories': [
+            {'id': row['category_id'], 'name': row['category__name'],
+             'slug': row['category__slug'], 'count': row['count']}
+            for row in categories
+        ],
+        'colors': [
+            {'id': row['color_id'], 'name': row['color__name'],
+             'hex_value': row['color__hex_value'], 'count': row['count']}
+            for row in colors
+        ],
+        'sizes': [
+            {'id': row['size_id'], 'name': row['size__name'],
+             'size_type': row['size__size_type'], 'count': row['count']}
+            for row in sizes
+        ],
+        'is_new': {'true': totals['is_new'], 'false': total - totals['is_new']},
+        'in_stock': {'true': totals['in_stock'], 'false': total - totals['in_stock']},
+        'price': [
+            {'min': low, 'max': high, 'count': totals[f'price_{index}']}
+            for index, (low, high) in enumerate(buckets)
+        ],
+    }
+
+
+def get_facets(queryset, query_params):
+    """Cached ``compute_facets`` keyed by the normalized filter parameters"""
+    key = facet_cache_key(query_params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, catalog_cache_timeout())
+    return facets
@@ -0,0 +1,79 @@
+"""
+Cached, pre-serialized featured products payload.
+
+The homepage requests this list on every load. It is built with a single
+query and kept in the cache until a write actually touches it: saving or
+deleting a featured product (or one that was in the payload), an image of
+such a product, or a category. Writes elsewhere in the catalog leave it alone.
+Invalidation runs after the write commits. The payload also expires after
+``FEATURED_CACHE_TIMEOUT``, which bounds staleness when the cache is per
+process and a delete cannot reach the other workers.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from .models import Product
+from .serializers import product_list_values, product_list_row
+
+FEATURED_CACHE_KEY = 'catalog:featured'
+
+# Products shown when nothing is featured
+FALLBACK_COUNT = 4
+
+
+def featured_limit():
+    return getattr(settings, 'FEATURED_PRODUCTS_LIMIT', 12)
+
+
+def featured_cache_timeout():
+    return getattr(settings, 'FEATURED_CACHE_TIMEOUT', 5 * 60)
+
+
+def featured_queryset():
+    """
+    Featured products first, then the rest by id, so one query yields either
+    the featured set or the fallback
+    """
+    return Product.objects.select_related('category').order_by('-is_featured', 'id')[:featured_limit()]
+
+
+def build_featured_payload():
+    rows = list(product_list_values(featured_queryset()))
+    featured = [row for row in rows if row['is_featured']]
+    fallback = not featured
+    if fallback:
+        featured = rows[:FALLBACK_COUNT]
+    return {
+        'ids': [row['id'] for row in featured],
+        'fallback': fallback,
+        'results': [product_list_row(row) for row in featured],
+    }
+
+
+def get_featured_payload():
+    payload = cache.get(FEATURED_CACHE_KEY)
+    if payload is None:
+        payload = build_featured_payload()
+        cache.set(FEATURED_CACHE_KEY, payload, featured_cache_timeout())
+    return payload
+
+
+def invalidate_featured(product_id=None, featured=False):
+    """
+    Drop the cached payload if a write to the product with ``product_id``
+    (``featured`` if it is featured) can change it; without a product, drop
+    it unconditionally
+    """
+    payload = cache.get(FEATURED_CACHE_KEY)
+    if payload is None:
+        return
+    if featured:
+        cache.delete(FEATURED_CACHE_KEY)
+        return
+    affected = (
+        product_id is None
+        or product_id in payload['ids']
+        # A short fallback list grows with the next product created
+        or (payload['fallback'] and len(payload['ids']) < FALLBACK_COUNT)
+    )
+    if affected:
+        cache.delete(FEATURED_CACHE_KEY)
\ No newline at end of file
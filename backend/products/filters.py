@@ -0,0 +1,52 @@
+"""
+Multi-value filters for the product list.
+
+``?color=red,blue&color=navy`` selects products available in any of the
+given colors. ``color``, ``size`` and ``category`` take names (slugs for
+categories); ``color_id``, ``size_id`` and ``category_id`` take ids, so a
+numeric size such as ``9`` is never read as an id. Colors and sizes are
+matched with an ``EXISTS`` subquery on the M2M through table instead of a
+join, so products are never duplicated and pagination counts stay right.
+"""
+from functools import reduce
+from operator import or_
+from django import forms
+from django.db.models import Exists, OuterRef, Q
+from django_filters import rest_framework as django_filters
+
+
+class ValueListWidget(forms.TextInput):
+    """Collect comma-separated and repeated query values into one list"""
+
+    def value_from_datadict(self, data, files, name):
+        values = data.getlist(name) if hasattr(data, 'getlist') else [data.get(name)]
+        return [part.strip() for value in values if value for part in value.split(',') if part.strip()]
+
+
+class ValueListField(forms.Field):
+    widget = ValueListWidget
+
+
+class ValueListFilter(django_filters.Filter):
+    field_class = ValueListField
+
+
+def name_condition(values, name_field, lookup='iexact'):
+    """Match any of ``values`` against ``name_field``"""
+    return reduce(or_, [Q(**{f'{name_field}__{lookup}': value}) for value in values])
+
+
+def id_values(values):
+    """The numeric ``values`` as ids; anything else matches nothing"""
+    return [int(value) for value in values if value.isdigit()]
+
+
+def exists_in_through(queryset, through, related, values=None, ids=None):
+    """Keep products linked through ``through`` to any of ``values`` (names) or ``ids``"""
+    if ids is None:
+        # Names resolve to ids once instead of joining the related table per link row
+        ids = through._meta.get_field(related).related_model.objects.filter(
+            name_condition(values, 'name')
+        ).values('pk')
+    links = through.objects.filter(product_id=OuterRef('pk'), **{f'{related}_id__in': ids})
+    return queryset.filter(Exists(links))
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""
+Cloudinary delivery URLs.
+
+Every image URL the API returns is built here from a stored public id.
+URLs carry ``f_auto,q_auto`` (best format and quality for the client) and a
+width limit from a named preset, so thumbnails aren't served as originals.
+Building a URL is plain string formatting, with no SDK or network call, and
+results are memoized per public id.
+"""
+import os
+from functools import lru_cache
+
+CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME', 'dr5mrez5h')
+DELIVERY_URL = f"https://res.cloudinary.com/{CLOUDINARY_CLOUD_NAME}/image/upload"
+
+# Preset name -> (default width, srcset widths)
+PRESETS = {
+    'thumb': (160, (160, 320)),
+    'card': (400, (400, 800)),
+    'detail': (1000, (600, 1000, 1600)),
+}
+
+
+def _transformation(width):
+    # c_limit scales down to the width but never upscales smaller originals
+    return f"f_auto,q_auto,c_limit,w_{width}" if width else "f_auto,q_auto"
+
+
+@lru_cache(maxsize=8192)
+def image_url(public_id, width=None):
+    """Delivery URL for ``public_id`` scaled to ``width``; full URLs pass through"""
+    if not public_id:
+        return None
+    if public_id.startswith('http'):
+        return public_id
+    return f"{DELIVERY_URL}/{_transformation(width)}/{public_id}"
+
+
+@lru_cache(maxsize=8192)
+def preset_url(public_id, preset):
+    return image_url(public_id, PRESETS[preset][0])
+
+
+@lru_cache(maxsize=8192)
+def preset_srcset(public_id, preset):
+    """``srcset`` value with one candidate per width of ``preset``"""
+    if not public_id or public_id.startswith('http'):
+        return None
+    return ', '.join(f"{image_url(public_id, width)} {width}w" for width in PRESETS[preset][1])
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Per-variant stock reservation.
+
+Stock is taken with one conditional statement per variant,
+``UPDATE ... SET quantity = quantity - n WHERE ... AND quantity >= n``,
+instead of reading the row under a lock and writing it back. The check and
+the decrement happen atomically in the database, so concurrent checkouts
+for the same variant never oversell. Each one holds the row lock only
+for the UPDATE and the rest of its (short) transaction.
+"""
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from .cache import bump_catalog_version
+from .featured import invalidate_featured
+from .models import Product, ProductStock
+
+
+class OutOfStock(Exception):
+    """Raised when a tracked variant has fewer units than requested"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        super().__init__("Some items are no longer available in the requested quantity.")
+
+
+def _merged(lines):
+    """
+    Sum ``(product_id, color_id, size_id, quantity)`` lines per variant, in a
+    fixed order so concurrent transactions lock rows in the same sequence
+    """
+    totals = {}
+    for product_id, color_id, size_id, quantity in lines:
+        key = (product_id, color_id, size_id)
+        totals[key] = totals.get(key, 0) + quantity
+    return sorted(totals.items())
+
+
+def reserve_stock(lines):
+    """
+    Decrement stock for every line or raise OutOfStock listing the variants
+    that could not be covered. Must run inside a transaction so a failure
+    rolls back the lines already reserved.
+    """
+    unavailable = []
+    for (product_id, color_id, size_id), quantity in _merged(lines):
+        variant = ProductStock.objects.filter(product_id=product_id, color_id=color_id, size_id=size_id)
+        if variant.filter(quantity__gte=quantity).update(quantity=F('quantity') - quantity):
+            continue
+        # Nothing updated: either untracked (allowed) or short
+        available = variant.values_list('quantity', flat=True).first()
+        if available is not None:
+            unavailable.append({
+                'product': product_id, 'color': color_id, 'size': size_id,
+                'requested': quantity, 'available': available,
+            })
+    if unavailable:
+        raise OutOfStock(unavailable)
+
+
+def release_stock(lines):
+    """Put the units of ``lines`` back, e.g. when an order is cancelled"""
+    for (product_id, color_id, size_id), quantity in _merged(lines):
+        ProductStock.objects.filter(
+            product_id=product_id, color_id=color_id, size_id=size_id
+        ).update(quantity=F('quantity') + quantity)
+
+
+def sync_in_stock(product_ids):
+    """
+    Derive ``Product.in_stock`` from the stock of tracked products; returns
+    the number of products whose flag changed
+    """
+    variants = ProductStock.objects.filter(product_id=OuterRef('pk'))
+    available = variants.filter(quantity__gt=0)
+    tracked = Product.objects.filter(pk__in=set(product_ids)).filter(Exists(variants))
+    changed = (
+        tracked.filter(in_stock=True).exclude(Exists(available)).update(in_stock=False)
+        + tracked.filter(in_stock=False).filter(Exists(available)).update(in_stock=True)
+    )
+    if changed:
+        # QuerySet.update() sends no signals. Invalidate after commit, or a
+        # concurrent read could cache the old flags under the new version
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(invalidate_featured)
+    return changed
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Populate Product.primary_image_public_id from each product's images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = Product.objects.all().sync_primary_images(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated primary image for {changed} product(s)"))
@@ -0,0 +1,48 @@
+import time
+from django.test import override_settings
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from products.benchmarking import synthetic_catalog
+from products.snapshot import get_snapshot
+from products.views import ProductViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare product list throughput served from the catalog snapshot "
+        "with the ORM path on synthetic catalogs (data is rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        view = ProductViewSet.as_view({'get': 'list'})
+
+        for size in options['sizes']:
+            with synthetic_catalog(size) as catalog:
+                slug = catalog['categories'][0].slug
+                queries = [
+                    {},
+                    {'page': 3},
+                    {'category': slug},
+                    {'ordering': '-price', 'in_stock': 'true'},
+                    {'min_price': 1000, 'max_price': 4000, 'ordering': 'created_at'},
+                ]
+                get_snapshot()
+                self.stdout.write(f"\n{size} products")
+                for label, enabled in [('orm', False), ('snapshot', True)]:
+                    # The response cache would hide both paths, so it is off here
+                    with override_settings(CATALOG_SNAPSHOT_ENABLED=enabled, CATALOG_RESPONSE_CACHE=False):
+                        start = time.perf_counter()
+                        for i in range(options['requests']):
+                            request = factory.get('/api/products/', queries[i % len(queries)], HTTP_HOST='localhost')
+                            response = view(request)
+                            assert response.status_code == 200, response.data
+                        elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"  {label:10} {options['requests'] / elapsed:8.1f} req/s "
+                        f"({elapsed * 1000 / options['requests']:.2f}ms/request)"
+                    )
\ No newline at end of file
@@ -0,0 +1,84 @@
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from products.inventory import OutOfStock, reserve_stock
+from products.models import Category, Color, Product, ProductStock, Size
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a flash sale: many threads buying one unit of a single SKU "
+        "until it sells out, with conditional UPDATE reservations and with "
+        "read-lock-write. The test SKU is committed and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--stock', type=int, default=500)
+
+    def handle(self, *args, **options):
+        category = Category.objects.create(name="Flash sale benchmark", slug=f"flash-sale-{time.time_ns()}")
+        color = Color.objects.create(name="Flash sale", hex_value="#000000")
+        size = Size.objects.create(name="FS")
+        product = Product.objects.create(name="Flash sale tee", price='10.00', category=category)
+        stock = ProductStock.objects.create(product=product, color=color, size=size, quantity=0)
+        line = (product.pk, color.pk, size.pk, 1)
+
+        def conditional():
+            reserve_stock([line])
+
+        def locking():
+            variant = ProductStock.objects.select_for_update().get(pk=stock.pk)
+            if variant.quantity < 1:
+                raise OutOfStock([])
+            variant.quantity -= 1
+            variant.save(update_fields=['quantity'])
+
+        try:
+            self.stdout.write(f"{options['threads']} threads, {options['stock']} units, {connection.vendor}")
+            for label, reserve in [('conditional update', conditional), ('read-lock-write', locking)]:
+                ProductStock.objects.filter(pk=stock.pk).update(quantity=options['stock'])
+                total, retries, elapsed = self.run_sale(reserve, options['threads'])
+                left = ProductStock.objects.get(pk=stock.pk).quantity
+                self.stdout.write(
+                    f"  {label:20} sold={total:5d} left={left:4d} oversold={max(0, total - options['stock']):3d} "
+                    f"retries={retries:5d} {total / elapsed:8.1f} reservations/s"
+                )
+        finally:
+            product.delete()
+            category.delete()
+            color.delete()
+            size.delete()
+
+    def run_sale(self, reserve, threads):
+        """Return (units sold, retries, seconds) once every buyer hits OutOfStock"""
+        sold = {}
+        retries = [0]
+        lock = threading.Lock()
+
+        def buyer(index):
+            count = 0
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            reserve()
+                        count += 1
+                    except OutOfStock:
+                        break
+                    except OperationalError:
+                        # e.g. SQLite "database is locked"; try again
+                        with lock:
+                            retries[0] += 1
+            finally:
+                sold[index] = count
+                connection.close()
+
+        workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sum(sold.values()), retries[0], time.perf_counter() - start
\ No newline at end of file
@@ -0,0 +1,85 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+from products.benchmarking import synthetic_catalog, timed
+from products.images import preset_url, preset_srcset
+from products.models import Product
+from products.serializers import ProductListSerializer, product_list_values, product_list_row
+
+
+class DeclaredFieldsSerializer(serializers.ModelSerializer):
+    """ProductListSerializer as it was before product_list_row: per-field serialization"""
+    category_name = serializers.CharField(source='category.name')
+    category_slug = serializers.CharField(source='category.slug')
+    image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    discount_price = serializers.SerializerMethodField()
+    price_display = serializers.SerializerMethodField()
+    discount_price_display = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'price', 'price_display', 'discount_price', 'discount_price_display',
+            'category_name', 'category_slug', 'image_url', 'image_srcset', 'is_new', 'is_featured',
+            'discount_percentage', 'in_stock'
+        ]
+
+    def get_image_url(self, obj):
+        return preset_url(obj.primary_image_public_id, 'card')
+
+    def get_image_srcset(self, obj):
+        return preset_srcset(obj.primary_image_public_id, 'card')
+
+    def get_discount_price(self, obj):
+        if obj.discount_percentage:
+            discount_percent = Decimal(str(obj.discount_percentage)) / Decimal('100')
+            return obj.price * (Decimal('1') - discount_percent)
+        return None
+
+    def get_price_display(self, obj):
+        return f"₱{obj.price}"
+
+    def get_discount_price_display(self, obj):
+        discount_price = self.get_discount_price(obj)
+        if discount_price is not None:
+            return f"₱{discount_price:.2f}"
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-row cost of rendering the product list: DRF field machinery (the "
+        "previous serializer), the ProductListSerializer fast path and the "
+        "values() projection"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        size = options['size']
+        with synthetic_catalog(size):
+            base = Product.objects.select_related('category').order_by('id')
+
+            def declared_fields():
+                return DeclaredFieldsSerializer(base.all(), many=True).data
+
+            def fast_serializer():
+                return ProductListSerializer(base.all(), many=True).data
+
+            def projection():
+                return [product_list_row(row) for row in product_list_values(base)]
+
+            self.stdout.write(f"{size} products (query and rendering)")
+            for label, func in [
+                ('declared fields', declared_fields),
+                ('serializer fast path', fast_serializer),
+                ('values() projection', projection),
+            ]:
+                median, best = timed(func, options['repeat'])
+                self.stdout.write(
+                    f"  {label:22} median={median:8.2f}ms best={best:8.2f}ms "
+                    f"per row={median * 1000 / size:6.1f}us"
+                )
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from products.benchmarking import synthetic_catalog, timed
+from products.models import Product
+from products.views import ProductFilter
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the EXISTS-based color/size filters with the previous M2M "
+        "join filters on a synthetic catalog (data is rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000)
+        parser.add_argument('--colors', type=int, default=40)
+        parser.add_argument('--sizes', type=int, default=20)
+        parser.add_argument('--colors-per-product', type=int, default=8)
+        parser.add_argument('--sizes-per-product', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=12)
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        with synthetic_catalog(
+            options['size'], colors=options['colors'], sizes=options['sizes'],
+            colors_per_product=options['colors_per_product'], sizes_per_product=options['sizes_per_product'],
+        ) as catalog:
+            color, other_color = catalog['colors'][1].name, catalog['colors'][2].name
+            size = catalog['sizes'][3].name
+            base = Product.objects.select_related('category')
+            cases = [
+                (f'color={color}', [('colors__name__icontains', color)]),
+                (f'color={color}&size={size}', [('colors__name__icontains', color), ('sizes__name__iexact', size)]),
+                (f'color={color},{other_color}', None),
+            ]
+            self.stdout.write(f"{options['size']} products, {options['colors_per_product']} colors "
+                              f"and {options['sizes_per_product']} sizes each")
+            for query, legacy in cases:
+                variants = [('exists', ProductFilter(QueryDict(query), queryset=base).qs)]
+                if legacy:
+                    joined = base
+                    for lookup, value in legacy:
+                        joined = joined.filter(**{lookup: value})
+                    variants.insert(0, ('join', joined))
+                for label, queryset in variants:
+
+                    def run():
+                        # What a paginated list request does: COUNT plus the first page
+                        queryset.count()
+                        list(queryset[:page_size])
+
+                    median, best = timed(run, options['repeat'])
+                    self.stdout.write(
+                        f"  {query:40} {label:7} rows={queryset.count():6d} "
+                        f"distinct={queryset.values('pk').distinct().count():6d} "
+                        f"median={median:8.2f}ms best={best:8.2f}ms"
+                    )
\ No newline at end of file
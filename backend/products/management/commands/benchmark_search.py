@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from products.benchmarking import synthetic_catalog, timed
+from products.models import Product
+from products.search import BasicSearchBackend, get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the database's full-text search backend with the icontains "
+        "scan on synthetic catalogs (data is rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--terms', nargs='+', default=['cotton', 'waterproof boots', 'aw4242', 'zzz'])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=12)
+
+    def handle(self, *args, **options):
+        native = get_search_backend()
+        backends = [('icontains', BasicSearchBackend())]
+        if type(native) is not BasicSearchBackend:
+            backends.append((type(native).__name__, native))
+        page_size = options['page_size']
+
+        for size in options['sizes']:
+            with synthetic_catalog(size):
+                native.rebuild()
+                self.stdout.write(f"\n{size} products")
+                for term in options['terms']:
+                    for label, backend in backends:
+                        queryset = backend.search(Product.objects.select_related('category'), term.split())
+
+                        def run():
+                            # What a paginated list request does: COUNT plus the first page
+                            queryset.count()
+                            list(queryset[:page_size])
+
+                        median, best = timed(run, options['repeat'])
+                        self.stdout.write(
+                            f"  {term!r:22} {label:22} hits={queryset.count():6d} "
+                            f"median={median:8.2f}ms best={best:8.2f}ms"
+                        )
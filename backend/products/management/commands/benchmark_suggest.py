@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from products.benchmarking import synthetic_catalog, timed
+from products.models import Product
+from products.search import BasicSearchBackend
+from products.suggest import build_suggest_index, suggest_limit
+
+
+class Command(BaseCommand):
+    help = (
+        "Time prefix-index suggestions against an icontains search for the "
+        "same keystrokes on a synthetic catalog (data is rolled back afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000)
+        parser.add_argument('--queries', nargs='+', default=['c', 'co', 'cot', 'cotton', 'cotton sh', 'zzz'])
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        limit = suggest_limit()
+        with synthetic_catalog(options['size']):
+            start = time.perf_counter()
+            index = build_suggest_index(version=None)
+            self.stdout.write(
+                f"{options['size']} products, index built in {(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+            backend = BasicSearchBackend()
+            for query in options['queries']:
+                queryset = backend.search(Product.objects.all(), query.split())
+
+                def scan():
+                    list(queryset.values('id', 'name', 'primary_image_public_id')[:limit])
+
+                index_median, _ = timed(lambda: index.search(query, limit), options['repeat'])
+                scan_median, _ = timed(scan, max(options['repeat'] // 20, 3))
+                self.stdout.write(
+                    f"  {query!r:14} hits={len(index.search(query, limit)):2d} "
+                    f"index={index_median * 1000:8.1f}us icontains={scan_median:8.2f}ms"
+                )
@@ -0,0 +1,15 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from products.cache import get_catalog_version, catalog_cache_key, catalog_cache_timeout
+from products.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Build the pre-serialized catalog snapshot and store it in the cache"
+
+    def handle(self, *args, **options):
+        blob = build_snapshot()
+        cache.set(catalog_cache_key('snapshot'), blob, catalog_cache_timeout())
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored catalog snapshot for version {get_catalog_version()} ({len(blob) // 1024} KiB)"
+        ))
\ No newline at end of file
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from products.related import build_related_products
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed related products for every product"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--window', type=int, default=100,
+                            help="Same-category candidates considered on each side, by price")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = build_related_products(
+            top_n=options['top'], batch_size=options['batch_size'],
+            window=options['window'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} related product links in {time.perf_counter() - start:.1f}s"
+        ))
\ No newline at end of file
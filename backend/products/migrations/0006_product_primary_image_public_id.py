@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-17 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_remove_product_categories_product_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_public_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
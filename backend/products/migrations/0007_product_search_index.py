@@ -0,0 +1,67 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE products_product ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS products_product_search_vector_gin "
+    "ON products_product USING GIN (search_vector)",
+    "UPDATE products_product AS p SET search_vector = "
+    "setweight(to_tsvector('english', coalesce(p.name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(p.description, '')), 'C') "
+    "FROM products_category AS c WHERE c.id = p.category_id",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS products_product_search_vector_gin",
+    "ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5("
+    "name, category, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO products_product_fts (rowid, name, category, description) "
+    "SELECT p.id, p.name, c.name, p.description FROM products_product p "
+    "JOIN products_category c ON c.id = p.category_id",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS products_product_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        try:
+            _run(schema_editor, SQLITE_FORWARD)
+        except OperationalError:
+            # SQLite built without FTS5: products.search falls back to icontains
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_primary_image_public_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
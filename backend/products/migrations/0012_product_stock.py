@@ -0,0 +1,32 @@
+# Generated by Django 5.0.3 on 2026-10-17 22:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.color')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='products.product')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='products.size')),
+            ],
+            options={
+                'verbose_name_plural': 'Product stock',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productstock',
+            constraint=models.UniqueConstraint(fields=('product', 'color', 'size'), name='unique_product_stock_variant'),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from decimal import Decimal
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Round
 from django.core.validators import MinValueValidator, MaxValueValidator
 from cloudinary.models import CloudinaryField
 
@@ -30,6 +33,36 @@ class Size(models.Model):
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def with_primary_image(self):
+        """
+        Preload each product's images ordered primary-first into
+        ``prefetched_images`` so the primary image resolves without a query
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                'images',
+                queryset=ProductImage.objects.order_by('-is_primary', 'id'),
+                to_attr='prefetched_images'
+            )
+        )
+    
+    def sync_primary_images(self, batch_size=500):
+        """
+        Recompute ``primary_image_public_id`` for every product in the queryset
+        and return how many rows changed
+        """
+        changed = []
+        products = self.with_primary_image().only('id', 'primary_image_public_id')
+        for product in products.iterator(chunk_size=batch_size):
+            image = product.primary_image
+            public_id = image.public_id if image else ''
+            if product.primary_image_public_id != public_id:
+                product.primary_image_public_id = public_id
+                changed.append(product)
+        self.model.objects.bulk_update(changed, ['primary_image_public_id'], batch_size=batch_size)
+        return len(changed)
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -45,11 +78,50 @@ class Product(models.Model):
         blank=True
     )
     in_stock = models.BooleanField(default=True)
+    # Public id of the primary image (or the first image when none is
+    # primary), kept in sync by ProductImage signals
+    primary_image_public_id = models.CharField(max_length=255, blank=True, default='')
+    # What customers pay: the list price less any discount, kept by the database
+    effective_price = models.GeneratedField(
+        expression=Round(F('price') * (100 - Coalesce('discount_percentage', 0)) * Value(Decimal('0.01')), 2),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination for every ordering the product list exposes
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['effective_price', 'id'], name='product_effective_price_id_idx'),
+            # Category pages, usually ordered by price
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            # Partial indexes for the boolean filters; each flag selects a small slice
+            models.Index(
+                fields=['price', 'id'], condition=Q(is_featured=True, in_stock=True),
+                name='product_featured_stock_idx',
+            ),
+            # Featured products first, then by id (FeaturedProductsView)
+            models.Index(fields=['-is_featured', 'id'], name='product_featured_order_idx'),
+            models.Index(fields=['created_at', 'id'], condition=Q(is_new=True), name='product_new_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(in_stock=True), name='product_in_stock_price_idx'),
+        ]
+    
     def __str__(self):
         return self.name
+    
+    @property
+    def primary_image(self):
+        """Return the primary image, falling back to the first image"""
+        prefetched = getattr(self, 'prefetched_images', None)
+        if prefetched is not None:
+            return prefetched[0] if prefetched else None
+        return self.images.order_by('-is_primary', 'id').first()
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -57,4 +129,50 @@ class ProductImage(models.Model):
     is_primary = models.BooleanField(default=False)
     
     def __str__(self):
-        return f"Image for {self.product.name}" 
\ No newline at end of file
+        return f"Image for {self.product.name}" 
+    
+    @property
+    def public_id(self):
+        """Cloudinary public id, or the raw value for legacy string images"""
+        if not self.image:
+            return ''
+        return getattr(self.image, 'public_id', None) or str(self.image)
+
+class ProductStock(models.Model):
+    """
+    Units available for one (product, color, size) variant. Variants without
+    a row are not tracked and can always be ordered.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock')
+    color = models.ForeignKey(Color, on_delete=models.CASCADE)
+    size = models.ForeignKey(Size, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Product stock"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'color', 'size'], name='unique_product_stock_variant'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} ({self.color.name}, {self.size.name}): {self.quantity}"
+
+class RelatedProduct(models.Model):
+    """
+    Precomputed recommendations: the top related products for ``product``,
+    rebuilt offline by the ``build_related_products`` command
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_to')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        constraints = [
+            # Also the index behind the related products endpoint
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_related_product_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} (#{self.rank})"
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Cached product option matrix for cart validation.
+
+Each product's valid color and size ids are cached under the catalog
+version, so any product, color or size write makes them stale. Validating a
+cart line is then a set membership check. On a cache miss, all requested
+products are loaded with one UNION query. Color and size names are only
+needed for error messages; they are cached separately and loaded when a line
+is rejected.
+"""
+from django.core.cache import cache
+from django.db.models import F, IntegerField, Value
+from .cache import get_catalog_version, catalog_cache_key, catalog_cache_timeout
+from .models import Color, Product, Size
+
+
+def load_product_options(product_ids):
+    """``{product_id: {'colors': frozenset, 'sizes': frozenset}}`` for the products that exist"""
+    columns = ('owner', 'kind', 'option')
+    products = Product.objects.filter(pk__in=product_ids).annotate(
+        owner=F('id'), kind=Value('product'), option=Value(None, output_field=IntegerField())
+    ).values_list(*columns)
+    colors = Product.colors.through.objects.filter(product_id__in=product_ids).annotate(
+        owner=F('product_id'), kind=Value('colors'), option=F('color_id')
+    ).values_list(*columns)
+    sizes = Product.sizes.through.objects.filter(product_id__in=product_ids).annotate(
+        owner=F('product_id'), kind=Value('sizes'), option=F('size_id')
+    ).values_list(*columns)
+
+    options = {}
+    rows = list(products.union(colors, sizes, all=True))
+    for product_id, kind, _ in rows:
+        if kind == 'product':
+            options[product_id] = {'colors': set(), 'sizes': set()}
+    for product_id, kind, option_id in rows:
+        if kind != 'product' and product_id in options:
+            options[product_id][kind].add(option_id)
+    return {
+        product_id: {kind: frozenset(ids) for kind, ids in product.items()}
+        for product_id, product in options.items()
+    }
+
+
+def get_product_options(product_ids):
+    """
+    Option matrix for ``product_ids`` from the cache, loading the missing
+    products with one query; unknown products are left out
+    """
+    # One version read, so every key comes from the same catalog version
+    version = get_catalog_version()
+    keys = {
+        product_id: catalog_cache_key('options', product_id, version=version)
+        for product_id in set(product_ids)
+    }
+    cached = cache.get_many(keys.values())
+    options = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+    missing = [product_id for product_id in keys if product_id not in options]
+    if missing:
+        loaded = load_product_options(missing)
+        cache.set_many({keys[product_id]: value for product_id, value in loaded.items()}, catalog_cache_timeout())
+        options.update(loaded)
+    return options
+
+
+def get_option_names():
+    """``{'colors': {id: name}, 'sizes': {id: name}}`` for error messages"""
+    key = catalog_cache_key('option-names')
+    names = cache.get(key)
+    if names is None:
+        names = {
+            'colors': dict(Color.objects.values_list('id', 'name')),
+            'sizes': dict(Size.objects.values_list('id', 'name')),
+        }
+        cache.set(key, names, catalog_cache_timeout())
+    return names
+
+
+def option_errors(options, product_id, color_id, size_id):
+    """
+    Field errors for a cart line given the matrix from
+    ``get_product_options``; empty when the line is valid
+    """
+    product = options.get(product_id)
+    if product is None:
+        return {'product_id': f"Product with ID {product_id} does not exist"}
+    errors = {}
+    for field, kind, label, option_id in (('color_id', 'colors', 'Color', color_id), ('size_id', 'sizes', 'Size', size_id)):
+        if option_id in product[kind]:
+            continue
+        name = get_option_names()[kind].get(option_id)
+        if name is None:
+            errors[field] = f"{label} with ID {option_id} does not exist"
+        else:
+            errors[field] = f"{label} {name} is not available for this product"
+    return errors
@@ -0,0 +1,103 @@
+"""
+Reference data (colors, sizes, categories) served from process memory.
+
+These tables change a few times a year, so each worker keeps them
+pre-serialized in memory. A small version number in the shared cache,
+bumped by model signals, tells every worker when to reload. Responses carry
+a content-hash ETag and ``Cache-Control: public`` so browsers and CDNs can
+absorb repeat traffic.
+
+Category listings with product counts change with every product write, so
+they are cached under the catalog version instead.
+"""
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .cache import catalog_cache_key, catalog_cache_timeout
+from .models import Category, Color, Size
+from .serializers import CategorySerializer, CategoryListSerializer
+
+REFERENCE_VERSION_KEY = 'reference:version'
+SECTIONS = ['colors', 'sizes', 'categories']
+
+_state = {'version': None, 'data': None, 'etags': None}
+
+
+def reference_max_age():
+    return getattr(settings, 'REFERENCE_DATA_MAX_AGE', 60 * 60)
+
+
+def get_reference_version():
+    version = cache.get(REFERENCE_VERSION_KEY)
+    if version is None:
+        # A fresh timestamp, so workers holding data from before a cache flush reload
+        cache.add(REFERENCE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(REFERENCE_VERSION_KEY)
+    return version
+
+
+def bump_reference_version():
+    version = max(time.time_ns(), (cache.get(REFERENCE_VERSION_KEY) or 0) + 1)
+    cache.set(REFERENCE_VERSION_KEY, version, None)
+    _state['version'] = None
+    return version
+
+
+def content_etag(data):
+    digest = hashlib.md5(json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def load_reference_data():
+    return {
+        'colors': list(Color.objects.order_by('id').values('name', 'hex_value')),
+        'sizes': list(Size.objects.order_by('id').values('name', 'size_type')),
+        'categories': CategorySerializer(Category.objects.order_by('id'), many=True).data,
+    }
+
+
+def get_reference_data():
+    """Return ``(data, etags)`` for every section, reloading when the version moved"""
+    version = get_reference_version()
+    if _state['version'] != version:
+        data = load_reference_data()
+        etags = {section: content_etag(data[section]) for section in SECTIONS}
+        etags[None] = content_etag(data)
+        _state.update(version=version, data=data, etags=etags)
+    return _state['data'], _state['etags']
+
+
+def reference_response(request, data, etag):
+    """
+    A 304 when ``If-None-Match`` matches ``etag``, otherwise ``data``; both
+    marked publicly cacheable
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(data)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=reference_max_age())
+    return response
+
+
+def get_category_listing():
+    """
+    Categories with total and in-stock product counts from one grouped
+    query, cached until the next catalog write
+    """
+    key = catalog_cache_key('categories')
+    categories = cache.get(key)
+    if categories is None:
+        queryset = Category.objects.annotate(
+            product_count=Count('products'),
+            in_stock_count=Count('products', filter=Q(products__in_stock=True)),
+        ).order_by('id')
+        categories = CategoryListSerializer(queryset, many=True).data
+        cache.set(key, categories, catalog_cache_timeout())
+    return categories
\ No newline at end of file
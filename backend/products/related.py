@@ -0,0 +1,122 @@
+"""
+Offline "related products" computation.
+
+Candidates for a product are the products closest in price within its
+category, plus anything bought in the same order. Each candidate is scored on:
+- shared category;
+- overlap of colors and of sizes, as Jaccard similarity;
+- price proximity;
+- co-purchase count.
+Color and size sets are held as integer bitsets, so overlap is two bitwise
+operations and a popcount. The top N per product go into RelatedProduct,
+written in batches so the table is never empty for long.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+from django.db import transaction
+from orders.models import OrderItem
+from .cache import bump_catalog_version
+from .models import Product, RelatedProduct
+
+WEIGHTS = {
+    'category': 1.0,
+    'colors': 0.6,
+    'sizes': 0.3,
+    'price': 0.8,
+    'co_purchase': 1.5,
+}
+
+
+def _bitsets(through, field):
+    """product id -> bitset of the related ids in ``through``"""
+    positions = {}
+    bits = defaultdict(int)
+    for product_id, related_id in through.objects.values_list('product_id', field):
+        position = positions.setdefault(related_id, len(positions))
+        bits[product_id] |= 1 << position
+    return bits
+
+
+def co_purchase_counts():
+    """``{product_id: Counter(other_product_id -> orders containing both)}``"""
+    counts = defaultdict(Counter)
+    rows = OrderItem.objects.order_by('order_id').values_list('order_id', 'product_id').distinct()
+    for _, items in groupby(rows, key=itemgetter(0)):
+        for a, b in combinations(sorted({product_id for _, product_id in items}), 2):
+            counts[a][b] += 1
+            counts[b][a] += 1
+    return counts
+
+
+def build_related_products(top_n=8, batch_size=500, window=100):
+    """
+    Recompute RelatedProduct for every product; returns the number of rows
+    written. Same-category candidates are limited to the ``window`` nearest
+    in price on either side.
+    """
+    products = {}
+    for row in Product.objects.values_list('id', 'category_id', 'price'):
+        products[row[0]] = (row[1], float(row[2]))
+    colors = _bitsets(Product.colors.through, 'color_id')
+    sizes = _bitsets(Product.sizes.through, 'size_id')
+    co_purchases = co_purchase_counts()
+
+    # Per category, products sorted by price with their features inlined
+    by_category = defaultdict(list)
+    for product_id, (category_id, price) in products.items():
+        by_category[category_id].append((price, product_id, colors[product_id], sizes[product_id]))
+    position = {}
+    for rows in by_category.values():
+        rows.sort()
+        for index, row in enumerate(rows):
+            position[row[1]] = index
+
+    w_category, w_colors, w_sizes = WEIGHTS['category'], WEIGHTS['colors'], WEIGHTS['sizes']
+    w_price, w_co_purchase = WEIGHTS['price'], WEIGHTS['co_purchase']
+
+    def scored(product_id):
+        category_id, price = products[product_id]
+        own_colors, own_sizes = colors[product_id], sizes[product_id]
+        co_purchased = co_purchases.get(product_id, {})
+        rows = by_category[category_id]
+        index = position[product_id]
+        candidates = rows[max(0, index - window):index + window + 1]
+        seen = {row[1] for row in candidates}
+        for other in co_purchased:
+            if other not in seen and other in products:
+                other_price = products[other][1]
+                candidates.append((other_price, other, colors[other], sizes[other]))
+        for other_price, other, other_colors, other_sizes in candidates:
+            if other == product_id:
+                continue
+            highest = max(price, other_price)
+            color_union = (own_colors | other_colors).bit_count()
+            size_union = (own_sizes | other_sizes).bit_count()
+            yield (
+                w_category * (products[other][0] == category_id)
+                + (w_colors * (own_colors & other_colors).bit_count() / color_union if color_union else 0.0)
+                + (w_sizes * (own_sizes & other_sizes).bit_count() / size_union if size_union else 0.0)
+                + (w_price * (1 - abs(price - other_price) / highest) if highest else w_price)
+                + w_co_purchase * math.log1p(co_purchased.get(other, 0))
+            ), other
+
+    written = 0
+    ids = sorted(products)
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        links = [
+            RelatedProduct(product_id=product_id, related_id=other, score=value, rank=rank)
+            for product_id in batch
+            for rank, (value, other) in enumerate(heapq.nlargest(top_n, scored(product_id)), start=1)
+        ]
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product_id__in=batch).delete()
+            RelatedProduct.objects.bulk_create(links)
+        written += len(links)
+
+    # bulk_create sends no signals; cached related responses must go
+    bump_catalog_version()
+    return written
\ No newline at end of file
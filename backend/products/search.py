@@ -0,0 +1,196 @@
+"""
+Pluggable full-text search for the product catalog.
+
+Postgres keeps a weighted ``tsvector`` column with a GIN index on the
+product table, SQLite mirrors products into an FTS5 virtual table and any
+other database falls back to the ``icontains`` scan that DRF's
+``SearchFilter`` performs. The storage for the native backends is created
+by ``products/migrations/0007_product_search_index.py``.
+"""
+import operator
+import re
+from functools import reduce
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+from .models import Product, Category
+
+PRODUCT_TABLE = Product._meta.db_table
+CATEGORY_TABLE = Category._meta.db_table
+FTS_TABLE = f'{PRODUCT_TABLE}_fts'
+
+# Searched columns and their relative weight, most important first
+SEARCH_FIELDS = ['name', 'category__name', 'description']
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BasicSearchBackend:
+    """
+    Substring search over the product columns (what SearchFilter used to do)
+    """
+    def index(self, product_ids):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, terms, ranked=True):
+        conditions = [
+            reduce(operator.or_, [models.Q(**{f'{field}__icontains': term}) for field in SEARCH_FIELDS])
+            for term in terms
+        ]
+        return queryset.filter(reduce(operator.and_, conditions))
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """
+    Ranked search against ``products_product.search_vector`` (GIN indexed)
+    """
+    config = 'english'
+
+    vector_sql = (
+        f"setweight(to_tsvector(%s, coalesce(p.name, '')), 'A') || "
+        f"setweight(to_tsvector(%s, coalesce(c.name, '')), 'B') || "
+        f"setweight(to_tsvector(%s, coalesce(p.description, '')), 'C')"
+    )
+
+    def _update(self, where='', params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {PRODUCT_TABLE} AS p SET search_vector = {self.vector_sql} "
+                f"FROM {CATEGORY_TABLE} AS c WHERE c.id = p.category_id {where}",
+                [self.config] * 3 + list(params)
+            )
+
+    def index(self, product_ids):
+        if product_ids:
+            self._update('AND p.id = ANY(%s)', [list(product_ids)])
+
+    def rebuild(self):
+        self._update()
+
+    def search(self, queryset, terms, ranked=True):
+        params = [self.config, ' '.join(terms)]
+        # An uncorrelated id subquery stays valid when the queryset is nested
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT id FROM {PRODUCT_TABLE} WHERE search_vector @@ websearch_to_tsquery(%s, %s)',
+            params
+        ))
+        if not ranked:
+            return queryset
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f'ts_rank({PRODUCT_TABLE}.search_vector, websearch_to_tsquery(%s, %s))',
+                params,
+                output_field=models.FloatField()
+            )
+        ).order_by('-search_rank', 'id')
+
+
+class SQLiteSearchBackend(BasicSearchBackend):
+    """
+    Ranked prefix search against the ``products_product_fts`` FTS5 table
+    """
+    # bm25 weights for the FTS columns (name, category, description)
+    weights = (10.0, 5.0, 1.0)
+
+    def _delete(self, cursor, product_ids):
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', list(product_ids))
+
+    def _insert(self, cursor, where='', params=()):
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, category, description) '
+            f'SELECT p.id, p.name, c.name, p.description FROM {PRODUCT_TABLE} p '
+            f'JOIN {CATEGORY_TABLE} c ON c.id = p.category_id {where}',
+            list(params)
+        )
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+            self._insert(cursor, f'WHERE p.id IN ({placeholders})', product_ids)
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, product_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            self._insert(cursor)
+
+    @staticmethod
+    def match_expression(terms):
+        """Quote every token and prefix-match it so user input can't inject FTS syntax"""
+        tokens = [token for term in terms for token in _TOKEN_RE.findall(term)]
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, terms, ranked=True):
+        match = self.match_expression(terms)
+        if not match:
+            return queryset
+        if not ranked:
+            # An uncorrelated id subquery stays valid when the queryset is nested
+            return queryset.filter(
+                pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+            )
+        bm25 = ', '.join(str(weight) for weight in self.weights)
+        # Join the FTS table so MATCH and bm25() are evaluated in a single pass;
+        # a correlated subquery would re-run the MATCH once per hit
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {PRODUCT_TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({FTS_TABLE}, {bm25})'},
+        ).order_by('-search_rank', 'id')
+
+
+_backend = None
+
+
+def _default_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return SQLiteSearchBackend()
+    return BasicSearchBackend()
+
+
+def get_search_backend():
+    """
+    Return the configured search backend; ``PRODUCT_SEARCH_BACKEND`` may name
+    a backend class, otherwise one is picked for the database in use
+    """
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+        _backend = import_string(path)() if path else _default_backend()
+    return _backend
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that delegates ``?search=`` to the catalog search backend
+    and orders list matches by relevance (an explicit ``?ordering=`` still wins)
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        # Only listings care about relevance; unranked matches can be nested
+        # as a subquery (e.g. by the facet counts)
+        ranked = getattr(view, 'action', None) == 'list'
+        return get_search_backend().search(queryset, terms, ranked=ranked)
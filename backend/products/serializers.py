@@ -1,44 +1,78 @@
 from rest_framework import serializers
 from .models import Product, Category, ProductImage, Color, Size
-import cloudinary
-import os
+from .images import preset_url, preset_srcset
 from decimal import Decimal
 
-# Get Cloudinary configuration from environment variables
-CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME', 'dr5mrez5h')
+# Columns the product list needs (created_at and effective_price only for
+# keyset cursors); the description is never loaded
+PRODUCT_LIST_VALUES = (
+    'id', 'name', 'price', 'discount_percentage', 'is_new', 'is_featured', 'in_stock',
+    'primary_image_public_id', 'category__name', 'category__slug', 'created_at', 'effective_price',
+)
+
+_price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+def product_list_values(queryset):
+    """``queryset`` as dicts with just the columns ``product_list_row`` needs"""
+    # Extra selects (such as the search rank) stay available for ordering
+    return queryset.values(*PRODUCT_LIST_VALUES, *queryset.query.extra_select)
+
+def product_list_row(row):
+    """
+    Render a ``PRODUCT_LIST_VALUES`` dict in the ProductListSerializer shape,
+    computing the discount once
+    """
+    price = row['price']
+    discount_price = None
+    if row['discount_percentage']:
+        discount_percent = Decimal(str(row['discount_percentage'])) / Decimal('100')
+        discount_price = price * (Decimal('1') - discount_percent)
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'price': _price_field.to_representation(price),
+        'price_display': f"₱{price}",
+        'discount_price': discount_price,
+        'discount_price_display': f"₱{discount_price:.2f}" if discount_price is not None else None,
+        'category_name': row['category__name'],
+        'category_slug': row['category__slug'],
+        'image_url': preset_url(row['primary_image_public_id'], 'card'),
+        'image_srcset': preset_srcset(row['primary_image_public_id'], 'card'),
+        'is_new': row['is_new'],
+        'is_featured': row['is_featured'],
+        'discount_percentage': row['discount_percentage'],
+        'in_stock': row['in_stock'],
+    }
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug']
 
+class CategoryListSerializer(CategorySerializer):
+    product_count = serializers.IntegerField(read_only=True)
+    in_stock_count = serializers.IntegerField(read_only=True)
+    
+    class Meta(CategorySerializer.Meta):
+        fields = CategorySerializer.Meta.fields + ['product_count', 'in_stock_count']
+
 class ProductImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'is_primary', 'image_url']
+        fields = ['id', 'image', 'is_primary', 'image_url', 'thumbnail_url', 'image_srcset']
     
     def get_image_url(self, obj):
-        try:
-            if obj.image:
-                # If it's a cloudinary image
-                if hasattr(obj.image, 'public_id'):
-                    return f"https://res.cloudinary.com/{CLOUDINARY_CLOUD_NAME}/image/upload/{obj.image.public_id}"
-                # If it has a URL attribute
-                elif hasattr(obj.image, 'url'):
-                    request = self.context.get('request')
-                    return request.build_absolute_uri(obj.image.url) if request else obj.image.url
-                # If it's a string (possibly a cloudinary path)
-                elif isinstance(obj.image, str):
-                    if obj.image.startswith('http'):
-                        return obj.image
-                    else:
-                        # Assume it's a cloudinary public ID
-                        return f"https://res.cloudinary.com/{CLOUDINARY_CLOUD_NAME}/image/upload/{obj.image}"
-        except Exception as e:
-            print(f"Error getting image URL: {e}")
-        return None
+        return preset_url(obj.public_id, 'detail')
+    
+    def get_thumbnail_url(self, obj):
+        return preset_url(obj.public_id, 'thumb')
+    
+    def get_image_srcset(self, obj):
+        return preset_srcset(obj.public_id, 'detail')
 
 class ColorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -51,57 +85,25 @@ class SizeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'size_type']
 
 class ProductListSerializer(serializers.ModelSerializer):
-    category_name = serializers.CharField(source='category.name')
-    category_slug = serializers.CharField(source='category.slug')
-    image_url = serializers.SerializerMethodField()
-    discount_price = serializers.SerializerMethodField()
-    price_display = serializers.SerializerMethodField()
-    discount_price_display = serializers.SerializerMethodField()
-    
     class Meta:
         model = Product
-        fields = [
-            'id', 'name', 'price', 'price_display', 'discount_price', 'discount_price_display', 
-            'category_name', 'category_slug', 'image_url', 'is_new', 'is_featured', 
-            'discount_percentage', 'in_stock'
-        ]
-    
-    def get_image_url(self, obj):
-        # Get primary image or first image
-        request = self.context.get('request')
-        primary_image = obj.images.filter(is_primary=True).first()
-        if not primary_image:
-            primary_image = obj.images.first()
-        
-        if primary_image:
-            if hasattr(primary_image.image, 'public_id'):
-                return f"https://res.cloudinary.com/{CLOUDINARY_CLOUD_NAME}/image/upload/{primary_image.image.public_id}"
-            elif hasattr(primary_image.image, 'url'):
-                return request.build_absolute_uri(primary_image.image.url) if request else primary_image.image.url
-            elif isinstance(primary_image.image, str):
-                if primary_image.image.startswith('http'):
-                    return primary_image.image
-                else:
-                    return f"https://res.cloudinary.com/{CLOUDINARY_CLOUD_NAME}/image/upload/{primary_image.image}"
-        return None
-    
-    def get_discount_price(self, obj):
-        if obj.discount_percentage:
-            # Convert percentage to Decimal to avoid type errors
-            discount_percent = Decimal(str(obj.discount_percentage)) / Decimal('100')
-            return obj.price * (Decimal('1') - discount_percent)
-        return None
-    
-    def get_price_display(self, obj):
-        # Format price with Philippine Peso symbol
-        return f"₱{obj.price}"
+        # Only what DRF introspects (e.g. browsable API forms); the rendered
+        # row and its computed fields come from product_list_row
+        fields = ['id', 'name', 'price', 'is_new', 'is_featured', 'discount_percentage', 'in_stock']
     
-    def get_discount_price_display(self, obj):
-        # Format discounted price with Philippine Peso symbol
-        discount_price = self.get_discount_price(obj)
-        if discount_price is not None:
-            return f"₱{discount_price:.2f}"
-        return None
+    def to_representation(self, instance):
+        return product_list_row({
+            'id': instance.id,
+            'name': instance.name,
+            'price': instance.price,
+            'discount_percentage': instance.discount_percentage,
+            'is_new': instance.is_new,
+            'is_featured': instance.is_featured,
+            'in_stock': instance.in_stock,
+            'primary_image_public_id': instance.primary_image_public_id,
+            'category__name': instance.category.name,
+            'category__slug': instance.category.slug,
+        })
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     category = CategorySerializer()
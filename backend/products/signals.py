@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .cache import bump_catalog_version
+from .featured import invalidate_featured
+from .inventory import sync_in_stock
+from .models import Product, ProductImage, Category, Color, Size, ProductStock
+from .reference import bump_reference_version
+from .search import get_search_backend
+
+CATALOG_MODELS = [Product, ProductImage, Category, Color, Size]
+REFERENCE_MODELS = [Category, Color, Size]
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def sync_primary_image(sender, instance, **kwargs):
+    """
+    Keep the denormalized primary image on the product row in step with its images
+    """
+    Product.objects.filter(pk=instance.product_id).sync_primary_images()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created=False, raw=False, **kwargs):
+    # The category name is part of every product's search document
+    if not created and not raw:
+        get_search_backend().index(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_featured_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Read now: a deleted instance has lost its pk by commit time
+        product_id, featured = instance.pk, instance.is_featured
+        transaction.on_commit(lambda: invalidate_featured(product_id=product_id, featured=featured))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_featured_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        product_id = instance.product_id
+        transaction.on_commit(lambda: invalidate_featured(product_id=product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_featured_category(sender, raw=False, **kwargs):
+    # Category names are embedded in every payload row
+    if not raw:
+        transaction.on_commit(invalidate_featured)
+
+
+@receiver(post_save, sender=ProductStock)
+@receiver(post_delete, sender=ProductStock)
+def sync_product_in_stock(sender, instance, raw=False, **kwargs):
+    """Keep the product's in_stock flag in step with its variant stock"""
+    if not raw:
+        sync_in_stock([instance.product_id])
+
+
+def invalidate_reference_data(sender, raw=False, **kwargs):
+    if not raw:
+        # After commit, or another worker could reload the old rows under the new version
+        transaction.on_commit(bump_reference_version)
+
+
+def invalidate_catalog(sender, **kwargs):
+    """Any catalog write makes every cached catalog response stale"""
+    if kwargs.get('raw') or kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    # After commit, or a concurrent read could cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+    post_delete.connect(invalidate_catalog, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+for through in [Product.colors.through, Product.sizes.through]:
+    m2m_changed.connect(invalidate_catalog, sender=through, dispatch_uid=f'catalog_m2m_{through.__name__}')
+
+for model in REFERENCE_MODELS:
+    post_save.connect(invalidate_reference_data, sender=model, dispatch_uid=f'reference_save_{model.__name__}')
+    post_delete.connect(invalidate_reference_data, sender=model, dispatch_uid=f'reference_delete_{model.__name__}')
\ No newline at end of file
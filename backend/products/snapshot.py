@@ -0,0 +1,192 @@
+"""
+Pre-serialized catalog snapshot.
+
+The whole catalog is rendered in the product list shape once per
+catalog version into a single JSON blob (plus per-category and featured
+index slices). List requests that only use filters and orderings the
+snapshot understands are answered by filtering and slicing that data in
+memory; everything else falls back to the ORM.
+"""
+import json
+import threading
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+from .cache import get_catalog_version, catalog_cache_key, catalog_cache_timeout
+from .models import Product
+from .serializers import product_list_values, product_list_row
+
+BOOLEAN_VALUES = {'true': True, 'True': True, 'false': False, 'False': False}
+
+# ?ordering= fields the snapshot keeps a pre-sorted index for. Not name: the
+# database sorts text by its collation, which Python's ordering doesn't match
+ORDERINGS = ['price', 'effective_price', 'created_at']
+
+# Parameters the snapshot can answer; anything else goes to the ORM
+SUPPORTED_PARAMS = {
+    'category', 'is_new', 'in_stock', 'is_featured', 'min_price', 'max_price',
+    'min_effective_price', 'max_effective_price', 'ordering', 'page',
+}
+
+# Price range parameters and the snapshot price list each one checks
+PRICE_RANGES = {
+    'min_price': ('prices', 'gte'),
+    'max_price': ('prices', 'lte'),
+    'min_effective_price': ('effective_prices', 'gte'),
+    'max_effective_price': ('effective_prices', 'lte'),
+}
+
+_local = threading.local()
+
+
+def snapshot_enabled():
+    return getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', True)
+
+
+def build_snapshot():
+    """Serialize every product and return the snapshot as a JSON string"""
+    values = list(product_list_values(Product.objects.order_by('id')))
+    categories = {}
+    featured = []
+    for index, row in enumerate(values):
+        categories.setdefault(row['category__slug'], []).append(index)
+        if row['is_featured']:
+            featured.append(index)
+    return json.dumps({
+        'products': [product_list_row(row) for row in values],
+        'created_at': [row['created_at'].timestamp() for row in values],
+        'effective_price': [str(row['effective_price']) for row in values],
+        'categories': categories,
+        'featured': featured,
+    }, cls=JSONEncoder)
+
+
+class Snapshot:
+    def __init__(self, version, blob):
+        data = json.loads(blob)
+        self.version = version
+        self.products = data['products']
+        self.categories = {slug: set(indices) for slug, indices in data['categories'].items()}
+        self.featured = set(data['featured'])
+        self.prices = [Decimal(row['price']) for row in self.products]
+        self.effective_prices = [Decimal(price) for price in data['effective_price']]
+        sort_keys = {
+            'price': self.prices,
+            'effective_price': self.effective_prices,
+            'created_at': data['created_at'],
+        }
+        # Rows are stored in id order, so a stable sort keeps id as tie-breaker
+        self.orders = {
+            field: sorted(range(len(self.products)), key=sort_keys[field].__getitem__)
+            for field in ORDERINGS
+        }
+        self.orders[None] = list(range(len(self.products)))
+
+
+class SnapshotRows:
+    """Sequence of serialized rows for a list of snapshot indices"""
+
+    def __init__(self, snapshot, indices):
+        self.snapshot = snapshot
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.snapshot.products[index] for index in self.indices[item]]
+        return self.snapshot.products[self.indices[item]]
+
+
+def get_snapshot():
+    """
+    Return the snapshot for the current catalog version, loading it from the
+    shared cache or rebuilding it when the catalog has changed
+    """
+    version = get_catalog_version()
+    snapshot = getattr(_local, 'snapshot', None)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    key = catalog_cache_key('snapshot', version=version)
+    blob = cache.get(key)
+    if blob is None:
+        blob = build_snapshot()
+        cache.set(key, blob, catalog_cache_timeout())
+    _local.snapshot = Snapshot(version, blob)
+    return _local.snapshot
+
+
+def _parse_params(query_params):
+    """
+    Translate list query parameters into snapshot filters, or return None when
+    the request needs something only the ORM can do
+    """
+    params = {key: query_params.get(key) for key in query_params if query_params.get(key) != ''}
+    if set(params) - SUPPORTED_PARAMS or any(len(query_params.getlist(key)) > 1 for key in params):
+        return None
+    parsed = {'category': None}
+    if 'category' in params:
+        slugs = [slug.strip() for slug in params['category'].split(',') if slug.strip()]
+        parsed['category'] = slugs or None
+    for key in ('is_new', 'in_stock'):
+        if key in params:
+            if params[key] not in BOOLEAN_VALUES:
+                return None
+            parsed[key] = BOOLEAN_VALUES[params[key]]
+    if 'is_featured' in params:
+        # Mirrors ProductViewSet.filter_queryset
+        parsed['is_featured'] = params['is_featured'].lower() == 'true'
+    for key in PRICE_RANGES:
+        if key in params:
+            try:
+                parsed[key] = Decimal(params[key])
+            except InvalidOperation:
+                return None
+            # NaN and Infinity parse but don't compare; the ORM filter rejects them
+            if not parsed[key].is_finite():
+                return None
+    ordering = params.get('ordering')
+    if ordering and ordering.lstrip('-') not in ORDERINGS:
+        return None
+    parsed['ordering'] = ordering
+    return parsed
+
+
+def filter_snapshot(snapshot, query_params):
+    """
+    Return the rows matching ``query_params`` in list order as a lazy
+    sequence, or None when the snapshot cannot answer the request
+    """
+    params = _parse_params(query_params)
+    if params is None:
+        return None
+
+    ordering = params['ordering']
+    indices = snapshot.orders[ordering.lstrip('-') if ordering else None]
+    if ordering and ordering.startswith('-'):
+        indices = indices[::-1]
+
+    products = snapshot.products
+    checks = []
+    if params['category'] is not None:
+        categories = set().union(*(snapshot.categories.get(slug, set()) for slug in params['category']))
+        checks.append(categories.__contains__)
+    if 'is_featured' in params:
+        featured = snapshot.featured
+        checks.append(featured.__contains__ if params['is_featured'] else lambda i: i not in featured)
+    for key in ('is_new', 'in_stock'):
+        if key in params:
+            checks.append(lambda i, key=key, value=params[key]: products[i][key] is value)
+    for key, (attr, lookup) in PRICE_RANGES.items():
+        if key in params:
+            prices, bound = getattr(snapshot, attr), params[key]
+            if lookup == 'gte':
+                checks.append(lambda i, prices=prices, bound=bound: prices[i] >= bound)
+            else:
+                checks.append(lambda i, prices=prices, bound=bound: prices[i] <= bound)
+
+    for check in checks:
+        indices = [index for index in indices if check(index)]
+    return SnapshotRows(snapshot, indices)
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Each process keeps products sorted by name, plus the sorted distinct words
+of product names and of category names. Each word has a bitset with one
+bit per product that contains it. A keystroke is a few ``bisect`` calls
+and bitwise operations on integers, with no database query. Unions for
+prefixes that span several words are memoized per index. Matches come back in this order:
+1. names starting with the whole query;
+2. names where every term starts a word;
+3. products matched through their category name.
+The index is built on first use and rebuilt when the catalog version changes.
+"""
+import threading
+from bisect import bisect_left
+from functools import reduce
+from operator import and_
+from django.conf import settings
+from .cache import get_catalog_version
+from .images import preset_url
+from .models import Product
+from .search import _TOKEN_RE
+
+# Sorts after any character a token can continue with
+_PREFIX_END = '\U0010ffff'
+
+
+def suggest_limit():
+    return getattr(settings, 'PRODUCT_SUGGEST_LIMIT', 8)
+
+
+def _normalize(text):
+    return ' '.join(_TOKEN_RE.findall(text.casefold()))
+
+
+def _bitset(positions, size):
+    bits = bytearray(size // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class _TokenIndex:
+    def __init__(self, texts):
+        positions = {}
+        size = 0
+        for size, text in enumerate(texts, start=1):
+            for token in _TOKEN_RE.findall(text.casefold()):
+                positions.setdefault(token, []).append(size - 1)
+        self.tokens = sorted(positions)
+        self.bits = [_bitset(positions[token], size) for token in self.tokens]
+        self.unions = {}
+
+    def prefixed(self, term):
+        """Bitset of the products with a word starting with ``term``"""
+        start = bisect_left(self.tokens, term)
+        end = bisect_left(self.tokens, term + _PREFIX_END, start)
+        if end - start <= 1:
+            return self.bits[start] if end > start else 0
+        union = self.unions.get(term)
+        if union is None:
+            union = self.unions[term] = reduce(int.__or__, self.bits[start:end])
+        return union
+
+
+def _extend(positions, bits, limit):
+    """Append the lowest set positions of ``bits`` until there are ``limit``"""
+    while bits and len(positions) < limit:
+        lowest = bits & -bits
+        positions.append(lowest.bit_length() - 1)
+        bits ^= lowest
+
+
+class SuggestIndex:
+    def __init__(self, version, rows):
+        self.version = version
+        # Positions are ranks in name order, so smaller means alphabetically first
+        rows = sorted(rows, key=lambda row: (_normalize(row[1]), row[0]))
+        self.names = [_normalize(name) for _, name, _, _ in rows]
+        self.hits = [
+            {'id': product_id, 'name': name, 'image': preset_url(public_id, 'thumb')}
+            for product_id, name, public_id, _ in rows
+        ]
+        self.name_index = _TokenIndex(name for _, name, _, _ in rows)
+        self.category_index = _TokenIndex(category for _, _, _, category in rows)
+
+    def search(self, query, limit):
+        query = _normalize(query)
+        if not query or limit <= 0:
+            return []
+
+        # Names starting with the query are one contiguous run
+        start = bisect_left(self.names, query)
+        end = bisect_left(self.names, query + _PREFIX_END)
+        positions = list(range(start, min(end, start + limit)))
+        seen = (1 << end) - (1 << start)
+
+        terms = query.split()
+        if len(positions) < limit:
+            named = [self.name_index.prefixed(term) for term in terms]
+            by_name = reduce(and_, named)
+            _extend(positions, by_name & ~seen, limit)
+            seen |= by_name
+        if len(positions) < limit:
+            matched = [names | self.category_index.prefixed(term) for names, term in zip(named, terms)]
+            _extend(positions, reduce(and_, matched) & ~seen, limit)
+        return [self.hits[position] for position in positions]
+
+
+def build_suggest_index(version):
+    rows = Product.objects.values_list('id', 'name', 'primary_image_public_id', 'category__name')
+    return SuggestIndex(version, list(rows))
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_suggest_index():
+    """This process's index for the current catalog version"""
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        # Another thread may have rebuilt it while this one waited
+        if _index is None or _index.version != version:
+            _index = build_suggest_index(version)
+        return _index
+
+
+def suggest(query, limit=None):
+    return get_suggest_index().search(query, suggest_limit() if limit is None else limit)
@@ -0,0 +1,1081 @@
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from backend.testing import IndexScanTestMixin, requires_postgres
+from .decorators import response_cache_stats
+from .models import Product, Category, ProductImage, Color, Size, RelatedProduct
+from orders.models import Order, OrderItem
+from .cache import CATALOG_VERSION_KEY, get_catalog_version, bump_catalog_version
+from .checks import check_shared_cache
+from .featured import FEATURED_CACHE_KEY, get_featured_payload
+from .images import preset_url, preset_srcset
+from .options import get_product_options, option_errors
+from .reference import get_reference_version
+from .serializers import ProductListSerializer, ProductDetailSerializer, product_list_values, product_list_row
+from .snapshot import get_snapshot
+from .views import ProductFilter
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CATALOG_SNAPSHOT_ENABLED=False)
+class ProductListQueryCountTests(TestCase):
+    """
+    The product list must cost the same number of queries regardless of
+    how many products (and images) end up on the page
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            Category.objects.create(name=f"Category {i}", slug=f"category-{i}")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create_products(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_products(count)
+
+    def _create_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f"Product {i}",
+                price='100.00',
+                category=self.categories[i % len(self.categories)],
+                discount_percentage=10 if i % 2 else None,
+            )
+            ProductImage.objects.create(product=product, image=f"products/extra_{i}")
+            ProductImage.objects.create(product=product, image=f"products/primary_{i}", is_primary=True)
+
+    def test_list_query_count_is_constant(self):
+        # COUNT for pagination, then products joined with category
+        self.create_products(2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.create_products(12)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 12)
+
+    def test_list_uses_primary_image(self):
+        self.create_products(1)
+        response = self.client.get(reverse('product-list'))
+        image_url = response.data['results'][0]['image_url']
+        self.assertTrue(image_url.endswith('/products/primary_0'))
+
+    def test_list_falls_back_to_first_image(self):
+        product = Product.objects.create(name="No primary", price='50.00', category=self.categories[0])
+        ProductImage.objects.create(product=product, image="products/first")
+        ProductImage.objects.create(product=product, image="products/second")
+        response = self.client.get(reverse('product-list'))
+        self.assertTrue(response.data['results'][0]['image_url'].endswith('/products/first'))
+
+
+class PrimaryImageSyncTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.product = Product.objects.create(name="Tee", price='10.00', category=category)
+
+    def test_image_signals_keep_column_in_sync(self):
+        first = ProductImage.objects.create(product=self.product, image="products/first")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_public_id, "products/first")
+
+        primary = ProductImage.objects.create(product=self.product, image="products/primary", is_primary=True)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_public_id, "products/primary")
+
+        primary.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_public_id, "products/first")
+
+        first.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_public_id, "")
+
+    def test_backfill_command(self):
+        ProductImage.objects.create(product=self.product, image="products/primary", is_primary=True)
+        Product.objects.update(primary_image_public_id='')
+        call_command('backfill_primary_images', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_public_id, "products/primary")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shoes = Category.objects.create(name="Shoes", slug="shoes")
+        shirts = Category.objects.create(name="Shirts", slug="shirts")
+        cls.boot = Product.objects.create(name="Leather Boot", price='90.00', category=shoes)
+        cls.tee = Product.objects.create(
+            name="Cotton Tee", price='20.00', category=shirts, description="Pairs well with a leather belt"
+        )
+        cls.hoodie = Product.objects.create(name="Fleece Hoodie", price='45.00', category=shirts)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, term, **params):
+        response = APIClient().get(reverse('product-list'), {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('leather'), [self.boot.id, self.tee.id])
+
+    def test_category_name_and_prefix_match(self):
+        self.assertEqual(set(self.search('shirt')), {self.tee.id, self.hoodie.id})
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('cotton leather'), [self.tee.id])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(self.search('leather', ordering='price'), [self.tee.id, self.boot.id])
+
+    def test_index_follows_writes(self):
+        self.hoodie.name = "Leather Hoodie"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hoodie.save()
+        self.assertIn(self.hoodie.id, self.search('leather'))
+        self.boot.category.name = "Footwear"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.boot.category.save()
+        self.assertEqual(self.search('footwear'), [self.boot.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.boot.delete()
+        self.assertEqual(self.search('footwear'), [])
+
+    def test_fts_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"leather*)('), [self.boot.id, self.tee.id])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PRODUCT_FACET_PRICE_BUCKETS=[50])
+class ProductFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        cls.shoes = Category.objects.create(name="Shoes", slug="shoes")
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        cls.blue = Color.objects.create(name="Blue", hex_value="#0000FF")
+        cls.medium = Size.objects.create(name="M")
+        tee = Product.objects.create(name="Tee", price='20.00', category=cls.shirts, is_new=True)
+        tee.colors.set([cls.red, cls.blue])
+        tee.sizes.set([cls.medium])
+        polo = Product.objects.create(name="Polo", price='60.00', category=cls.shirts, in_stock=False)
+        polo.colors.set([cls.red])
+        Product.objects.create(name="Boot", price='90.00', category=cls.shoes)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_facets(self, **params):
+        response = APIClient().get(reverse('product-facets'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts(self):
+        facets = self.get_facets()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(
+            [(row['slug'], row['count']) for row in facets['categories']],
+            [('shirts', 2), ('shoes', 1)]
+        )
+        self.assertEqual([(row['name'], row['count']) for row in facets['colors']], [('Blue', 1), ('Red', 2)])
+        self.assertEqual([(row['name'], row['count']) for row in facets['sizes']], [('M', 1)])
+        self.assertEqual(facets['is_new'], {'true': 1, 'false': 2})
+        self.assertEqual(facets['in_stock'], {'true': 2, 'false': 1})
+        self.assertEqual([row['count'] for row in facets['price']], [1, 2])
+
+    def test_filters_apply_without_duplicating_rows(self):
+        facets = self.get_facets(color='red,blue', category='shirts')
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual([(row['name'], row['count']) for row in facets['colors']], [('Blue', 1), ('Red', 2)])
+        self.assertEqual(self.get_facets(search='tee')['total'], 1)
+
+    def test_cached_until_catalog_write(self):
+        self.get_facets(category='shirts')
+        with self.assertNumQueries(0):
+            self.get_facets(category='shirts')
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Henley", price='30.00', category=self.shirts)
+        self.assertEqual(self.get_facets(category='shirts')['total'], 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProductKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        # Repeated prices force the id tie-breaker to do its job
+        for i in range(30):
+            Product.objects.create(name=f"Product {i:02d}", price=f"{i % 4}0.00", category=category)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, ordering):
+        client = APIClient()
+        response = client.get(reverse('product-list'), {'pagination': 'cursor', 'ordering': ordering})
+        pages = [response.data]
+        while response.data['next']:
+            with self.assertNumQueries(1):
+                response = client.get(response.data['next'])
+            pages.append(response.data)
+        return pages
+
+    def test_pages_cover_every_product_in_order(self):
+        for ordering, key in [('price', 'price'), ('-price', 'price'), ('name', 'name'), ('-created_at', 'id')]:
+            pages = self.walk(ordering)
+            self.assertEqual([len(page['results']) for page in pages], [12, 12, 6])
+            rows = [row for page in pages for row in page['results']]
+            self.assertEqual(len({row['id'] for row in rows}), 30)
+            values = [(float(row[key]) if key == 'price' else row[key], row['id']) for row in rows]
+            self.assertEqual(values, sorted(values, reverse=ordering.startswith('-')))
+
+    def test_no_count_and_previous_link(self):
+        pages = self.walk('price')
+        self.assertNotIn('count', pages[0])
+        self.assertIsNone(pages[0]['previous'])
+        response = APIClient().get(pages[2]['previous'])
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [row['id'] for row in pages[1]['results']]
+        )
+
+    def test_invalid_cursor(self):
+        response = APIClient().get(reverse('product-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination_is_still_the_default(self):
+        response = APIClient().get(reverse('product-list'))
+        self.assertEqual(response.data['count'], 30)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalCatalogGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.product = Product.objects.create(name="Tee", price='20.00', category=cls.category, is_featured=True)
+        Color.objects.create(name="Red", hex_value="#FF0000")
+        Size.objects.create(name="M")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_endpoints_answer_304_without_queries(self):
+        urls = [
+            reverse('product-list'),
+            reverse('product-detail', args=[self.product.pk]),
+            reverse('product-facets'),
+            reverse('featured-products'),
+            reverse('category-list'),
+            reverse('category-detail', args=[self.category.slug]),
+            reverse('colors-list'),
+            reverse('sizes-list'),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_etag_only(self):
+        # Second-resolution dates can't tell apart two writes in the same second
+        response = self.client.get(reverse('product-list'))
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get(reverse('product-list'), HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_related_write_changes_etag(self):
+        etag = self.client.get(reverse('product-list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Color.objects.create(name="Blue", hex_value="#0000FF")
+        response = self.client.get(reverse('product-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_not_reused_after_cache_flush(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+        self.category.name = "Tops"
+        self.category.save()
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category']['name'], "Tops")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CatalogResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.product = Product.objects.create(name="Tee", price='20.00', category=cls.category)
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hit_after_miss_and_param_order_is_normalized(self):
+        url = reverse('product-list')
+        self.assertEqual(self.get(url, category='shirts', is_new='false')['X-Catalog-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'{url}?is_new=false&category=shirts')
+        self.assertEqual(response['X-Catalog-Cache'], 'hit')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_every_catalog_model_invalidates(self):
+        url = reverse('product-list')
+        writes = [
+            lambda: Product.objects.create(name="Polo", price='30.00', category=self.category),
+            lambda: ProductImage.objects.create(product=self.product, image="products/tee"),
+            lambda: Category.objects.create(name="Hats", slug="hats"),
+            lambda: Color.objects.create(name="Blue", hex_value="#0000FF"),
+            lambda: Size.objects.create(name="L"),
+            lambda: self.product.colors.add(self.red),
+            lambda: self.product.delete(),
+        ]
+        for write in writes:
+            self.get(url)
+            self.assertEqual(self.get(url)['X-Catalog-Cache'], 'hit')
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertEqual(self.get(url)['X-Catalog-Cache'], 'miss')
+
+    def test_version_bumped_on_commit(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Polo", price='30.00', category=self.category)
+            # A read before the commit must not cache old rows under a new version
+            self.assertEqual(get_catalog_version(), version)
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}):
+                url = reverse('product-list')
+                first = self.get(url)
+                second = self.get(url)
+                self.assertEqual(second['X-Catalog-Cache'], 'hit')
+                self.assertEqual(second.data, first.data)
+                self.assertEqual(response_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_stats_endpoint_requires_staff(self):
+        self.assertEqual(self.client.get(reverse('catalog-cache-stats')).status_code, 401)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass')
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.get(reverse('catalog-cache-stats')).data, {'hits': 0, 'misses': 0})
+
+    @override_settings(DEBUG=False)
+    def test_per_process_cache_warns_outside_debug(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        database = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'django_cache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([warning.id for warning in check_shared_cache()], ['products.W001'])
+            with override_settings(DEBUG=True):
+                self.assertEqual(check_shared_cache(), [])
+        with override_settings(CACHES=database):
+            self.assertEqual(check_shared_cache(), [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CATALOG_RESPONSE_CACHE=False)
+class CatalogSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shirts = Category.objects.create(name="Shirts", slug="shirts")
+        shoes = Category.objects.create(name="Shoes", slug="shoes")
+        for i in range(15):
+            Product.objects.create(
+                name=f"Item {i % 5}",
+                price=f'{10 + (i * 7) % 40}.00',
+                category=shirts if i % 3 else shoes,
+                is_new=i % 2 == 0,
+                is_featured=i % 4 == 0,
+                in_stock=i % 5 != 0,
+                discount_percentage=15 if i % 3 == 0 else None,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assertMatchesOrm(self, **params):
+        get_snapshot()
+        with self.assertNumQueries(0):
+            from_snapshot = self.client.get(reverse('product-list'), params)
+        with override_settings(CATALOG_SNAPSHOT_ENABLED=False):
+            from_orm = self.client.get(reverse('product-list'), params)
+        self.assertEqual(from_snapshot.status_code, 200)
+        self.assertEqual(from_snapshot.json()['count'], from_orm.json()['count'])
+        self.assertEqual(
+            [row['id'] for row in from_snapshot.json()['results']],
+            [row['id'] for row in from_orm.json()['results']],
+        )
+        self.assertEqual(from_snapshot.json(), from_orm.json())
+
+    def test_matches_orm(self):
+        self.assertMatchesOrm()
+        self.assertMatchesOrm(page=2)
+        self.assertMatchesOrm(category='shirts', in_stock='true')
+        self.assertMatchesOrm(is_new='false', is_featured='true')
+        self.assertMatchesOrm(min_price='20', max_price='40.5', ordering='-created_at')
+        self.assertMatchesOrm(ordering='price', category='shoes')
+        self.assertMatchesOrm(category='shoes,2024')
+        self.assertMatchesOrm(ordering='-effective_price', min_effective_price='15', max_effective_price='30')
+
+    def test_unsupported_params_fall_back_to_orm(self):
+        get_snapshot()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-list'), {'search': 'item', 'ordering': 'name'})
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('product-list'), {'is_new': 'maybe'})
+        with self.assertNumQueries(2):
+            self.client.get(reverse('product-list'), {'ordering': 'name'})
+
+    def test_non_finite_prices_are_rejected(self):
+        for value in ['NaN', 'sNaN', 'Infinity', '-inf']:
+            response = self.client.get(reverse('product-list'), {'min_price': value})
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_rebuilt_after_catalog_change(self):
+        self.assertEqual(self.client.get(reverse('product-list')).json()['count'], 15)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Late", price='5.00', category=Category.objects.get(slug='shoes'))
+        response = self.client.get(reverse('product-list'), {'ordering': 'price'})
+        self.assertEqual(response.json()['count'], 16)
+        self.assertEqual(response.json()['results'][0]['name'], "Late")
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('build_catalog_snapshot', stdout=out)
+        self.assertIn('Stored catalog snapshot', out.getvalue())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('product-list')).status_code, 200)
+
+
+@requires_postgres
+@override_settings(SECURE_SSL_REDIRECT=False, CATALOG_SNAPSHOT_ENABLED=False, CATALOG_RESPONSE_CACHE=False)
+class CatalogIndexUsageTests(IndexScanTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        for i in range(20):
+            Product.objects.create(
+                name=f"Shirt {i}", price=f'{20 + i}.00', category=category,
+                is_new=i % 4 == 0, is_featured=i % 5 == 0, in_stock=i % 3 != 0,
+            )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+
+    def test_category_by_price(self):
+        self.assertIndexScans(
+            {'products_product': 'product_category_price_idx'}, self.client.get, reverse('product-list'),
+            {'category': 'shirts', 'ordering': 'price'},
+        )
+
+    def test_featured_in_stock(self):
+        self.assertIndexScans(
+            {'products_product': 'product_featured_stock_idx'}, self.client.get, reverse('product-list'),
+            {'is_featured': 'true', 'in_stock': 'true', 'ordering': 'price'},
+        )
+
+    def test_new_arrivals(self):
+        self.assertIndexScans(
+            {'products_product': 'product_new_idx'}, self.client.get, reverse('product-list'),
+            {'is_new': 'true', 'ordering': '-created_at'},
+        )
+
+    def test_featured_endpoint(self):
+        self.assertIndexScans(
+            {'products_product': 'product_featured_order_idx'}, self.client.get, reverse('featured-products')
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FEATURED_PRODUCTS_LIMIT=3)
+class FeaturedProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.products = [
+            Product.objects.create(name=f"Shirt {i}", price='20.00', category=cls.category)
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        get_catalog_version()
+        self.client = APIClient()
+
+    def featured_names(self):
+        response = self.client.get(reverse('featured-products'))
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_falls_back_to_first_products(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.featured_names(), ["Shirt 0", "Shirt 1", "Shirt 2"])
+
+    def test_single_query_then_cached(self):
+        for product in self.products[1:3]:
+            product.is_featured = True
+            product.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.featured_names(), ["Shirt 1", "Shirt 2"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.featured_names(), ["Shirt 1", "Shirt 2"])
+
+    def test_limit(self):
+        Product.objects.update(is_featured=True)
+        self.assertEqual(self.featured_names(), ["Shirt 0", "Shirt 1", "Shirt 2"])
+
+    def save(self, product):
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+    def test_only_featured_writes_invalidate(self):
+        featured = self.products[0]
+        featured.is_featured = True
+        self.save(featured)
+        self.featured_names()
+
+        self.products[4].name = "Renamed"
+        self.save(self.products[4])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.featured_names(), ["Shirt 0"])
+
+        featured.name = "Featured tee"
+        self.save(featured)
+        self.assertEqual(self.featured_names(), ["Featured tee"])
+
+        self.products[5].is_featured = True
+        self.save(self.products[5])
+        self.assertEqual(self.featured_names(), ["Featured tee", "Shirt 5"])
+
+        featured.is_featured = False
+        self.save(featured)
+        self.assertEqual(self.featured_names(), ["Shirt 5"])
+
+    def test_payload_expires(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            get_featured_payload()
+        cache_set.assert_called_once_with(FEATURED_CACHE_KEY, mock.ANY, 5 * 60)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, REFERENCE_DATA_MAX_AGE=600)
+class ReferenceDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Color.objects.create(name="Red", hex_value="#FF0000")
+        Size.objects.create(name="M")
+        Category.objects.create(name="Shirts", slug="shirts")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_served_from_memory_with_http_caching(self):
+        url = reverse('colors-list')
+        response = self.client.get(url)
+        self.assertEqual(response.json(), [{'name': 'Red', 'hex_value': '#FF0000'}])
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=600', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            again = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_signals_invalidate(self):
+        url = reverse('sizes-list')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Size.objects.create(name="L")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.json()], ["M", "L"])
+
+    def test_version_bumped_on_commit(self):
+        version = get_reference_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Color.objects.create(name="Blue", hex_value="#0000FF")
+            self.assertEqual(get_reference_version(), version)
+        self.assertGreater(get_reference_version(), version)
+
+    def test_categories(self):
+        response = self.client.get(reverse('category-list'))
+        self.assertEqual(response.json()['count'], 1)
+        self.assertIn('ETag', response)
+        detail = self.client.get(reverse('category-detail', args=['shirts']))
+        self.assertEqual(detail.json()['name'], "Shirts")
+        self.assertEqual(self.client.get(reverse('category-detail', args=['hats'])).status_code, 404)
+
+    def test_combined_payload(self):
+        data = self.client.get(reverse('reference-data')).json()
+        self.assertEqual(set(data), {'colors', 'sizes', 'categories'})
+        self.assertEqual(data['categories'][0]['slug'], 'shirts')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PRODUCT_BULK_MAX_IDS=5)
+class ProductBulkLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        red = Color.objects.create(name="Red", hex_value="#FF0000")
+        medium = Size.objects.create(name="M")
+        cls.products = []
+        for i in range(4):
+            product = Product.objects.create(name=f"Shirt {i}", price='20.00', category=category)
+            product.colors.add(red)
+            product.sizes.add(medium)
+            ProductImage.objects.create(product=product, image=f"products/shirt_{i}")
+            cls.products.append(product)
+
+    def setUp(self):
+        cache.clear()
+        get_catalog_version()
+        self.client = APIClient()
+        self.url = reverse('product-bulk')
+
+    def test_get_keeps_order_with_constant_queries(self):
+        ids = [self.products[2].pk, self.products[0].pk, 999]
+        # Products with category, then images, colors and sizes
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], ids[:2])
+        self.assertEqual(response.data['missing'], [999])
+        self.assertEqual(response.data['results'][0]['colors'][0]['name'], "Red")
+
+        with self.assertNumQueries(4):
+            self.client.get(self.url, {'ids': ','.join(str(product.pk) for product in self.products)})
+
+    def test_post(self):
+        ids = [product.pk for product in reversed(self.products)]
+        response = self.client.post(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], ids)
+
+    def test_validation(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,abc'}).status_code, 400)
+        response = self.client.post(self.url, {'ids': list(range(1, 7))}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 5', response.data['error'])
+        for ids in [5, {'a': 1}, None, [[1]]]:
+            response = self.client.post(self.url, {'ids': ids}, format='json')
+            self.assertEqual(response.status_code, 400, ids)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProductMultiValueFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        cls.shoes = Category.objects.create(name="Shoes", slug="shoes")
+        cls.hats = Category.objects.create(name="Hats", slug="hats")
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        cls.blue = Color.objects.create(name="Blue", hex_value="#0000FF")
+        cls.dark_red = Color.objects.create(name="Dark Red", hex_value="#8B0000")
+        cls.small = Size.objects.create(name="S")
+        cls.medium = Size.objects.create(name="M")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=cls.shirts)
+        cls.tee.colors.set([cls.red, cls.blue])
+        cls.tee.sizes.set([cls.small, cls.medium])
+        cls.boot = Product.objects.create(name="Boot", price='90.00', category=cls.shoes)
+        cls.boot.colors.set([cls.dark_red])
+        cls.boot.sizes.set([cls.medium])
+        cls.cap = Product.objects.create(name="Cap", price='15.00', category=cls.hats)
+        cls.cap.colors.set([cls.blue])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def names(self, params):
+        response = self.client.get(reverse('product-list'), params)
+        self.assertEqual(response.status_code, 200)
+        names = [row['name'] for row in response.data['results']]
+        self.assertEqual(response.data['count'], len(names))
+        return sorted(names)
+
+    def test_colors_by_name_and_id_without_duplicates(self):
+        self.assertEqual(self.names({'color': 'red,BLUE'}), ["Cap", "Tee"])
+        self.assertEqual(self.names({'color': ['red', 'dark red']}), ["Boot", "Tee"])
+        self.assertEqual(self.names({'color_id': [str(self.red.pk), str(self.dark_red.pk)]}), ["Boot", "Tee"])
+
+    def test_sizes_and_categories_combine(self):
+        self.assertEqual(self.names({'size': 'm'}), ["Boot", "Tee"])
+        self.assertEqual(self.names({'size': 'M', 'category': 'shoes,hats'}), ["Boot"])
+        self.assertEqual(self.names({'category_id': f'{self.hats.pk},{self.shirts.pk}'}), ["Cap", "Tee"])
+        self.assertEqual(self.names({'size_id': self.small.pk}), ["Tee"])
+
+    def test_numeric_names_are_not_ids(self):
+        numeric = Size.objects.create(name=str(self.small.pk))
+        sandal = Product.objects.create(name="Sandal", price='30.00', category=self.shoes)
+        sandal.sizes.set([numeric])
+        self.assertEqual(self.names({'size': str(self.small.pk)}), ["Sandal"])
+        self.assertEqual(self.names({'size_id': str(self.small.pk)}), ["Tee"])
+        self.assertEqual(self.names({'category': str(self.hats.pk)}), [])
+        self.assertEqual(self.names({'size_id': 'M'}), [])
+
+    def test_uses_exists_not_joins(self):
+        queryset = ProductFilter({'color': 'red,blue', 'size': 'M'}, queryset=Product.objects.all()).qs
+        sql = str(queryset.query).upper()
+        self.assertEqual(sql.count('EXISTS'), 2)
+        self.assertNotIn('DISTINCT', sql)
+
+
+class ProductListProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.products = [
+            Product.objects.create(name="Plain", price='20.00', category=category, description="Long text"),
+            Product.objects.create(name="Sale", price='19.99', category=category, discount_percentage=33),
+            Product.objects.create(name="Free", price='5.00', category=category, discount_percentage=100),
+        ]
+        ProductImage.objects.create(product=cls.products[0], image="products/plain", is_primary=True)
+
+    def expected_rows(self):
+        """The list rows written out by hand, independent of product_list_row"""
+        common = {
+            'category_name': "Shirts", 'category_slug': "shirts",
+            'is_new': False, 'is_featured': False, 'in_stock': True,
+        }
+        return [
+            {
+                **common, 'id': self.products[0].pk, 'name': "Plain",
+                'price': '20.00', 'price_display': "₱20.00",
+                'discount_price': None, 'discount_price_display': None, 'discount_percentage': None,
+                'image_url': preset_url("products/plain", 'card'),
+                'image_srcset': preset_srcset("products/plain", 'card'),
+            },
+            {
+                **common, 'id': self.products[1].pk, 'name': "Sale",
+                'price': '19.99', 'price_display': "₱19.99",
+                'discount_price': 13.3933, 'discount_price_display': "₱13.39", 'discount_percentage': 33,
+                'image_url': None, 'image_srcset': None,
+            },
+            {
+                **common, 'id': self.products[2].pk, 'name': "Free",
+                'price': '5.00', 'price_display': "₱5.00",
+                'discount_price': 0.0, 'discount_price_display': "₱0.00", 'discount_percentage': 100,
+                'image_url': None, 'image_srcset': None,
+            },
+        ]
+
+    def rendered(self, rows):
+        return json.loads(JSONRenderer().render(rows))
+
+    def test_serializer_and_projection_render_expected_rows(self):
+        expected = self.expected_rows()
+        queryset = Product.objects.select_related('category').order_by('id')
+        self.assertEqual(self.rendered(ProductListSerializer(queryset, many=True).data), expected)
+        self.assertEqual(self.rendered([product_list_row(row) for row in product_list_values(queryset)]), expected)
+
+    def test_description_is_not_loaded(self):
+        sql = str(product_list_values(Product.objects.all()).query)
+        self.assertNotIn('description', sql)
+        self.assertIn('products_category', sql)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, CATALOG_SNAPSHOT_ENABLED=False)
+class EffectivePriceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.full = Product.objects.create(name="Full", price='20.00', category=category)
+        cls.sale = Product.objects.create(name="Sale", price='40.00', category=category, discount_percentage=75)
+        cls.odd = Product.objects.create(name="Odd", price='19.99', category=category, discount_percentage=33)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_computed_by_database(self):
+        prices = dict(Product.objects.values_list('name', 'effective_price'))
+        self.assertEqual(prices, {'Full': Decimal('20.00'), 'Sale': Decimal('10.00'), 'Odd': Decimal('13.39')})
+        self.sale.discount_percentage = 50
+        self.sale.save()
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.effective_price, Decimal('20.00'))
+
+    def test_filter_and_order(self):
+        response = self.client.get(reverse('product-list'), {'ordering': 'effective_price'})
+        self.assertEqual([row['name'] for row in response.data['results']], ["Sale", "Odd", "Full"])
+        response = self.client.get(reverse('product-list'), {'max_effective_price': '15', 'min_price': '30'})
+        self.assertEqual([row['name'] for row in response.data['results']], ["Sale"])
+
+    def test_keyset_pages(self):
+        response = self.client.get(
+            reverse('product-list'), {'ordering': '-effective_price', 'pagination': 'cursor'}
+        )
+        names = [row['name'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            names += [row['name'] for row in response.data['results']]
+        self.assertEqual(names, ["Full", "Odd", "Sale"])
+
+
+class ImageUrlTests(TestCase):
+    def test_presets(self):
+        url = preset_url('products/tee', 'card')
+        self.assertTrue(url.startswith('https://res.cloudinary.com/'))
+        self.assertTrue(url.endswith('/image/upload/f_auto,q_auto,c_limit,w_400/products/tee'))
+        self.assertEqual(
+            preset_srcset('products/tee', 'thumb'),
+            f"{preset_url('products/tee', 'thumb')} 160w, {url.replace('w_400', 'w_320')} 320w",
+        )
+
+    def test_passthrough_and_empty(self):
+        self.assertEqual(preset_url('https://example.com/tee.jpg', 'card'), 'https://example.com/tee.jpg')
+        self.assertIsNone(preset_srcset('https://example.com/tee.jpg', 'card'))
+        self.assertIsNone(preset_url('', 'card'))
+
+    def test_memoized(self):
+        preset_url('products/memo', 'detail')
+        hits = preset_url.cache_info().hits
+        preset_url('products/memo', 'detail')
+        self.assertEqual(preset_url.cache_info().hits, hits + 1)
+
+    def test_detail_images(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        product = Product.objects.create(name="Tee", price='20.00', category=category)
+        ProductImage.objects.create(product=product, image="products/tee")
+        image = ProductDetailSerializer(product).data['images'][0]
+        self.assertIn('w_1000', image['image_url'])
+        self.assertIn('w_160', image['thumbnail_url'])
+        self.assertEqual(image['image_srcset'].count('w,'), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CategoryCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        cls.hats = Category.objects.create(name="Hats", slug="hats")
+        for i in range(14):
+            Product.objects.create(name=f"Shirt {i}", price='20.00', category=cls.shirts, in_stock=i % 2 == 0)
+
+    def setUp(self):
+        cache.clear()
+        get_catalog_version()
+        self.client = APIClient()
+
+    def test_counts_from_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('category-list'))
+        counts = {row['slug']: (row['product_count'], row['in_stock_count']) for row in response.data['results']}
+        self.assertEqual(counts, {'shirts': (14, 7), 'hats': (0, 0)})
+        with self.assertNumQueries(0):
+            self.client.get(reverse('category-list'), {'page': 1})
+
+    def test_invalidated_by_product_writes(self):
+        self.client.get(reverse('category-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Cap", price='10.00', category=self.hats)
+        response = self.client.get(reverse('category-list'))
+        self.assertEqual(response.data['results'][1]['product_count'], 1)
+
+    def test_detail_embeds_first_page_of_products(self):
+        for snapshot in (True, False):
+            with self.subTest(snapshot=snapshot), override_settings(CATALOG_SNAPSHOT_ENABLED=snapshot):
+                cache.clear()
+                response = self.client.get(reverse('category-detail', args=['shirts']))
+                self.assertEqual(response.data['in_stock_count'], 7)
+                products = response.data['products']
+                self.assertEqual(products['count'], 14)
+                self.assertEqual(len(products['results']), 12)
+                self.assertEqual(products['results'][0]['name'], "Shirt 0")
+                page = self.client.get(products['next'])
+                self.assertEqual([row['name'] for row in page.data['products']['results']], ["Shirt 12", "Shirt 13"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RelatedProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        shirts = Category.objects.create(name="Shirts", slug="shirts")
+        hats = Category.objects.create(name="Hats", slug="hats")
+        red = Color.objects.create(name="Red", hex_value="#FF0000")
+        blue = Color.objects.create(name="Blue", hex_value="#0000FF")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=shirts)
+        cls.polo = Product.objects.create(name="Polo", price='22.00', category=shirts)
+        cls.shirt = Product.objects.create(name="Dress shirt", price='90.00', category=shirts)
+        cls.cap = Product.objects.create(name="Cap", price='15.00', category=hats)
+        cls.beanie = Product.objects.create(name="Beanie", price='15.00', category=hats)
+        cls.tee.colors.set([red])
+        cls.polo.colors.set([red])
+        cls.shirt.colors.set([blue])
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'secret-pass')
+        medium = Size.objects.create(name="M")
+        for _ in range(2):
+            order = Order.objects.create(
+                user=user, payment_method='credit_card', shipping_address='Somewhere', total_price='35.00'
+            )
+            for product in (cls.tee, cls.cap):
+                OrderItem.objects.create(order=order, product=product, color=red, size=medium, price=product.price)
+
+    def setUp(self):
+        cache.clear()
+        get_catalog_version()
+
+    def test_build_and_serve(self):
+        out = StringIO()
+        call_command('build_related_products', '--top', '3', '--batch-size', '2', stdout=out)
+        self.assertIn('Stored', out.getvalue())
+        ranked = list(RelatedProduct.objects.filter(product=self.tee).order_by('rank').values_list('related__name', flat=True))
+        # Same category and color first, then the co-purchased cap; the beanie is never a candidate
+        self.assertEqual(ranked, ["Polo", "Cap", "Dress shirt"])
+
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse('product-related', args=[self.tee.pk]))
+        self.assertEqual([row['name'] for row in response.data['results']], ranked)
+
+    def test_unknown_product(self):
+        client = APIClient()
+        self.assertEqual(client.get(reverse('product-related', args=[self.beanie.pk])).data['results'], [])
+        self.assertEqual(client.get(reverse('product-related', args=[0])).status_code, 404)
+        self.assertEqual(client.get(reverse('product-related', args=['tee'])).status_code, 404)
+
+    def test_rebuild_replaces_rows(self):
+        call_command('build_related_products', stdout=StringIO())
+        count = RelatedProduct.objects.count()
+        call_command('build_related_products', stdout=StringIO())
+        self.assertEqual(RelatedProduct.objects.count(), count)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProductSuggestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        jackets = Category.objects.create(name="Jackets", slug="jackets")
+        pants = Category.objects.create(name="Pants", slug="pants")
+        shirts = Category.objects.create(name="Shirts", slug="shirts")
+        Product.objects.create(name="Denim jeans", price='60.00', category=pants)
+        Product.objects.create(name="Denim jacket", price='80.00', category=jackets, primary_image_public_id='p/denim')
+        Product.objects.create(name="Blue denim shirt", price='30.00', category=shirts)
+        Product.objects.create(name="Rain coat", price='70.00', category=jackets)
+
+    def setUp(self):
+        cache.clear()
+        # A fresh version so no index built by another test is reused
+        bump_catalog_version()
+        self.client = APIClient()
+
+    def suggest(self, q):
+        response = self.client.get(reverse('product-suggest'), {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [hit['name'] for hit in response.data['results']]
+
+    def test_ranking(self):
+        # Name prefix, then a word in the name, then the category name
+        self.assertEqual(self.suggest("denim"), ["Denim jacket", "Denim jeans", "Blue denim shirt"])
+        self.assertEqual(self.suggest("JACK"), ["Denim jacket", "Rain coat"])
+        self.assertEqual(self.suggest("den sh"), ["Blue denim shirt"])
+        self.assertEqual(self.suggest(""), [])
+        self.assertEqual(self.suggest("zz"), [])
+
+    def test_hit_shape(self):
+        response = self.client.get(reverse('product-suggest'), {'q': 'denim jack'})
+        hit = response.data['results'][0]
+        self.assertEqual(set(hit), {'id', 'name', 'image'})
+        self.assertEqual(hit['image'], preset_url('p/denim', 'thumb'))
+
+    @override_settings(PRODUCT_SUGGEST_LIMIT=2)
+    def test_limit(self):
+        self.assertEqual(self.suggest("d"), ["Denim jacket", "Denim jeans"])
+
+    def test_served_from_memory_and_rebuilt_on_writes(self):
+        self.suggest("denim")
+        with self.assertNumQueries(0):
+            self.suggest("rain")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Denim vest", price='40.00', category=Category.objects.get(slug="jackets"))
+        self.assertEqual(self.suggest("denim v"), ["Denim vest"])
+
+
+class ProductOptionMatrixTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        cls.red = Color.objects.create(name="Red", hex_value="#FF0000")
+        cls.blue = Color.objects.create(name="Blue", hex_value="#0000FF")
+        cls.medium = Size.objects.create(name="M")
+        cls.tee = Product.objects.create(name="Tee", price='20.00', category=category)
+        cls.bare = Product.objects.create(name="Bare", price='20.00', category=category)
+        cls.tee.colors.set([cls.red])
+        cls.tee.sizes.set([cls.medium])
+
+    def setUp(self):
+        cache.clear()
+        get_catalog_version()
+
+    def test_loaded_once_per_catalog_version(self):
+        with self.assertNumQueries(1):
+            options = get_product_options([self.tee.pk, self.bare.pk, 0])
+        self.assertEqual(options[self.tee.pk], {'colors': {self.red.pk}, 'sizes': {self.medium.pk}})
+        self.assertEqual(options[self.bare.pk], {'colors': set(), 'sizes': set()})
+        self.assertNotIn(0, options)
+        with self.assertNumQueries(0):
+            get_product_options([self.tee.pk, self.bare.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tee.colors.add(self.blue)
+        self.assertEqual(get_product_options([self.tee.pk])[self.tee.pk]['colors'], {self.red.pk, self.blue.pk})
+
+    def test_one_version_read_per_lookup(self):
+        ids = [self.tee.pk, self.bare.pk] + list(range(1000, 1100))
+        get_product_options(ids)
+        with mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            get_product_options(ids)
+        # locmem's get_many() calls get() per key; count the version reads
+        version_reads = [call for call in cache_get.call_args_list if call.args[0] == CATALOG_VERSION_KEY]
+        self.assertEqual(len(version_reads), 1)
+
+    def test_errors(self):
+        options = get_product_options([self.tee.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(option_errors(options, self.tee.pk, self.red.pk, self.medium.pk), {})
+        self.assertEqual(option_errors(options, 0, self.red.pk, self.medium.pk), {
+            'product_id': "Product with ID 0 does not exist",
+        })
+        self.assertEqual(option_errors(options, self.tee.pk, self.blue.pk, 0), {
+            'color_id': "Color Blue is not available for this product",
+            'size_id': "Size with ID 0 does not exist",
+        })
\ No newline at end of file
@@ -1,37 +1,128 @@
 from rest_framework import viewsets, generics, filters, permissions, status
 from rest_framework.response import Response
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from django.conf import settings
+from django.http import QueryDict
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
 from .models import Product, Category, Color, Size
-from .serializers import ProductListSerializer, ProductDetailSerializer, CategorySerializer
+from .serializers import (
+    ProductListSerializer, ProductDetailSerializer, CategoryListSerializer,
+    product_list_values, product_list_row
+)
+from .filters import ValueListFilter, name_condition, id_values, exists_in_through
+from .search import ProductSearchFilter
+from .facets import get_facets
+from .featured import featured_queryset, get_featured_payload
+from .reference import get_reference_data, get_category_listing, reference_response
+from .snapshot import snapshot_enabled, get_snapshot, filter_snapshot
+from .suggest import suggest
+from .decorators import conditional_catalog_response, cached_catalog_response, response_cache_stats
+from backend.pagination import OptionalKeysetPagination
 import logging
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 class ProductFilter(django_filters.FilterSet):
-    category = django_filters.CharFilter(field_name='category__slug')
+    category = ValueListFilter(method='filter_category')
+    category_id = ValueListFilter(method='filter_category_id')
     min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
-    color = django_filters.CharFilter(field_name='colors__name', lookup_expr='icontains')
-    size = django_filters.CharFilter(field_name='sizes__name', lookup_expr='iexact')
+    min_effective_price = django_filters.NumberFilter(field_name='effective_price', lookup_expr='gte')
+    max_effective_price = django_filters.NumberFilter(field_name='effective_price', lookup_expr='lte')
+    color = ValueListFilter(method='filter_color')
+    size = ValueListFilter(method='filter_size')
+    color_id = ValueListFilter(method='filter_color_id')
+    size_id = ValueListFilter(method='filter_size_id')
     
     class Meta:
         model = Product
-        fields = ['category', 'is_new', 'in_stock', 'min_price', 'max_price', 'color', 'size']
+        fields = [
+            'category', 'is_new', 'in_stock', 'min_price', 'max_price',
+            'min_effective_price', 'max_effective_price', 'color', 'size',
+            'category_id', 'color_id', 'size_id'
+        ]
+    
+    def filter_category(self, queryset, name, values):
+        return queryset.filter(name_condition(values, 'category__slug', 'exact'))
+    
+    def filter_category_id(self, queryset, name, values):
+        return queryset.filter(category_id__in=id_values(values))
+    
+    def filter_color(self, queryset, name, values):
+        return exists_in_through(queryset, Product.colors.through, 'color', values)
+    
+    def filter_color_id(self, queryset, name, values):
+        return exists_in_through(queryset, Product.colors.through, 'color', ids=id_values(values))
+    
+    def filter_size(self, queryset, name, values):
+        return exists_in_through(queryset, Product.sizes.through, 'size', values)
+    
+    def filter_size_id(self, queryset, name, values):
+        return exists_in_through(queryset, Product.sizes.through, 'size', ids=id_values(values))
+
+def bulk_product_ids(request):
+    """
+    Product ids from ``?ids=`` (comma-separated or repeated) or a POSTed
+    ``ids`` list, de-duplicated in order; raises ValueError when invalid
+    """
+    if request.method == 'POST':
+        raw = request.data.get('ids', []) if hasattr(request.data, 'get') else []
+        if isinstance(raw, str):
+            raw = raw.split(',')
+        elif not isinstance(raw, list):
+            raise ValueError("'ids' must be a list or a comma-separated string")
+    else:
+        raw = [part for value in request.query_params.getlist('ids') for part in value.split(',')]
+    
+    ids, seen = [], set()
+    for value in raw:
+        try:
+            pk = int(str(value).strip())
+        except ValueError:
+            raise ValueError(f"Invalid product id: {value}")
+        if pk not in seen:
+            seen.add(pk)
+            ids.append(pk)
+    if not ids:
+        raise ValueError("Provide at least one product id in 'ids'")
+    max_ids = getattr(settings, 'PRODUCT_BULK_MAX_IDS', 50)
+    if len(ids) > max_ids:
+        raise ValueError(f"At most {max_ids} products can be requested at once")
+    return ids
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for browsing products
     """
-    queryset = Product.objects.all()
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    queryset = Product.objects.select_related('category')
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, filters.OrderingFilter]
     filterset_class = ProductFilter
     search_fields = ['name', 'description', 'category__name']
-    ordering_fields = ['price', 'name', 'created_at']
+    ordering_fields = ['price', 'effective_price', 'name', 'created_at']
+    pagination_class = OptionalKeysetPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('retrieve', 'bulk'):
+            return queryset.prefetch_related('images', 'colors', 'sizes')
+        return queryset
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        
+        # Handle is_featured parameter separately if present
+        is_featured = self.request.query_params.get('is_featured', None)
+        if is_featured is not None:
+            # Convert string parameter to boolean
+            is_featured_bool = is_featured.lower() == 'true'
+            queryset = queryset.filter(is_featured=is_featured_bool)
+        return queryset
     
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'bulk'):
             return ProductDetailSerializer
         return ProductListSerializer
     
@@ -40,25 +131,40 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         context.update({'request': self.request})
         return context
     
+    def list_from_snapshot(self, request):
+        """
+        Paginate pre-serialized rows from the catalog snapshot, or return None
+        when the request has to go through the ORM
+        """
+        if not snapshot_enabled() or self.paginator is None:
+            return None
+        rows = filter_snapshot(get_snapshot(), request.query_params)
+        if rows is None:
+            return None
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(rows)
+        return self.get_paginated_response(page)
+    
+    @conditional_catalog_response
+    @cached_catalog_response
     def list(self, request, *args, **kwargs):
         try:
-            # Get queryset with filters applied
-            queryset = self.filter_queryset(self.get_queryset())
-            
-            # Handle is_featured parameter separately if present
-            is_featured = request.query_params.get('is_featured', None)
-            if is_featured is not None:
-                # Convert string parameter to boolean
-                is_featured_bool = is_featured.lower() == 'true'
-                queryset = queryset.filter(is_featured=is_featured_bool)
+            response = self.list_from_snapshot(request)
+            if response is not None:
+                return response
+
+            # Get queryset with filters applied, reduced to the listed columns
+            queryset = product_list_values(self.filter_queryset(self.get_queryset()))
             
             page = self.paginate_queryset(queryset)
             if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
+                return self.get_paginated_response([product_list_row(row) for row in page])
 
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data)
+            return Response([product_list_row(row) for row in queryset])
+        except (NotFound, ValidationError):
+            # Invalid page number or cursor, or filter values the filterset rejects
+            raise
         except Exception as e:
             logger.error(f"Error in ProductViewSet.list: {str(e)}")
             return Response(
@@ -66,6 +172,8 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @conditional_catalog_response
+    @cached_catalog_response
     def retrieve(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -78,6 +186,88 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    @conditional_catalog_response
+    def facets(self, request):
+        """
+        Per-facet product counts for the same filters the list accepts
+        """
+        try:
+            queryset = self.filter_queryset(self.get_queryset())
+            return Response(get_facets(queryset, request.query_params))
+        except Exception as e:
+            logger.error(f"Error in ProductViewSet.facets: {str(e)}")
+            return Response(
+                {"error": "An error occurred while retrieving product facets"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get', 'post'], permission_classes=[permissions.AllowAny])
+    @conditional_catalog_response
+    @cached_catalog_response
+    def bulk(self, request):
+        """
+        Many products by id (``?ids=1,2,3`` or a POSTed ``{"ids": [...]}``) in
+        one response, in the requested order, with a fixed number of queries
+        """
+        try:
+            ids = bulk_product_ids(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            products = {product.pk: product for product in self.get_queryset().filter(pk__in=ids)}
+            found = [products[pk] for pk in ids if pk in products]
+            serializer = self.get_serializer(found, many=True)
+            return Response({
+                "results": serializer.data,
+                "missing": [pk for pk in ids if pk not in products],
+            })
+        except Exception as e:
+            logger.error(f"Error in ProductViewSet.bulk: {str(e)}")
+            return Response(
+                {"error": "An error occurred while retrieving products"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """
+        Typeahead hits for ``?q=`` from the in-memory prefix index
+        """
+        try:
+            return Response({"results": suggest(request.query_params.get('q', ''))})
+        except Exception as e:
+            logger.error(f"Error in ProductViewSet.suggest: {str(e)}")
+            return Response(
+                {"error": "An error occurred while retrieving suggestions"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=True, methods=['get'])
+    @conditional_catalog_response
+    @cached_catalog_response
+    def related(self, request, pk=None):
+        """
+        Precomputed related products, best match first
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        try:
+            queryset = Product.objects.filter(related_to__product_id=pk).order_by('related_to__rank')
+            results = [product_list_row(row) for row in product_list_values(queryset)]
+            # Only an empty result needs the extra check for an unknown product
+            found = bool(results) or Product.objects.filter(pk=pk).exists()
+        except Exception as e:
+            logger.error(f"Error in ProductViewSet.related: {str(e)}")
+            return Response(
+                {"error": "An error occurred while retrieving related products"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        if not found:
+            raise NotFound()
+        return Response({"results": results})
+
 class FeaturedProductsView(generics.ListAPIView):
     """
     API endpoint for featured products
@@ -86,22 +276,20 @@ class FeaturedProductsView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        try:
-            # Use a simpler, more robust approach
-            featured = Product.objects.filter(is_featured=True)
-            return featured if featured.exists() else Product.objects.all()[:4]
-        except Exception as e:
-            logger.error(f"Error in FeaturedProductsView.get_queryset: {str(e)}")
-            return Product.objects.none()  # Return empty queryset on error
-    
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context.update({'request': self.request})
-        return context
+        return featured_queryset()
     
+    @conditional_catalog_response
     def list(self, request, *args, **kwargs):
         try:
-            return super().list(request, *args, **kwargs)
+            # Pre-serialized rows, cached until a featured product changes
+            results = get_featured_payload()['results']
+            page = self.paginate_queryset(results)
+            if page is not None:
+                return self.get_paginated_response(page)
+            return Response(results)
+        except NotFound:
+            # Invalid page number
+            raise
         except Exception as e:
             logger.error(f"Error in FeaturedProductsView.list: {str(e)}")
             return Response(
@@ -114,8 +302,41 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     API endpoint for product categories
     """
     queryset = Category.objects.all()
-    serializer_class = CategorySerializer
+    serializer_class = CategoryListSerializer
     lookup_field = 'slug'
+    
+    @conditional_catalog_response
+    @cached_catalog_response
+    def list(self, request, *args, **kwargs):
+        categories = get_category_listing()
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(categories)
+    
+    @conditional_catalog_response
+    @cached_catalog_response
+    def retrieve(self, request, *args, **kwargs):
+        """
+        The category with its counts and the first page of its products
+        (``?page=`` selects another page)
+        """
+        slug = kwargs[self.lookup_field]
+        category = next((row for row in get_category_listing() if row['slug'] == slug), None)
+        if category is None:
+            raise NotFound()
+        
+        rows = None
+        if snapshot_enabled():
+            params = QueryDict(mutable=True)
+            params['category'] = slug
+            rows = filter_snapshot(get_snapshot(), params)
+        if rows is not None:
+            page = self.paginate_queryset(rows)
+        else:
+            queryset = Product.objects.filter(category_id=category['id']).order_by('id')
+            page = [product_list_row(row) for row in self.paginate_queryset(product_list_values(queryset))]
+        return Response({**category, 'products': self.get_paginated_response(page).data})
 
 class ColorListView(generics.ListAPIView):
     """
@@ -126,8 +347,8 @@ class ColorListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
     
     def list(self, request, *args, **kwargs):
-        colors = self.get_queryset().values('name', 'hex_value')
-        return Response(colors)
+        data, etags = get_reference_data()
+        return reference_response(request, data['colors'], etags['colors'])
 
 class SizeListView(generics.ListAPIView):
     """
@@ -138,5 +359,24 @@ class SizeListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
     
     def list(self, request, *args, **kwargs):
-        sizes = self.get_queryset().values('name', 'size_type')
-        return Response(sizes) 
\ No newline at end of file
+        data, etags = get_reference_data()
+        return reference_response(request, data['sizes'], etags['sizes'])
+
+class ReferenceDataView(generics.GenericAPIView):
+    """
+    API endpoint returning colors, sizes and categories in one response
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, *args, **kwargs):
+        data, etags = get_reference_data()
+        return reference_response(request, data, etags[None])
+
+class CatalogCacheStatsView(generics.GenericAPIView):
+    """
+    API endpoint exposing catalog response cache hit/miss counters
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, *args, **kwargs):
+        return Response(response_cache_stats())
\ No newline at end of file